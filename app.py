@@ -7,7 +7,7 @@ def display_backup_files():
         st.write("No backups found.")
         return
 
-    backups = sorted([f for f in os.listdir('backups') if f.startswith('funds_scores_backup_')])
+    backups = sorted([f for f in os.listdir('backups') if f.startswith('funds_scores_backup_') and f.endswith('.db')])
     if backups:
         st.write("Backup Files:")
         for backup in backups:
@@ -18,30 +18,54 @@ def display_backup_files():
 
 # app
 import streamlit as st
-import pandas as pd
-import time
-from data_functions import uploaded_file_check, all_around_batting_average, up_benchmark_batting_average, \
-    down_benchmark_batting_average, calculate_excess_return, calculate_annualized_return, calculate_annualized_std, \
-    calculate_tracking_error, calculate_sharpe_ratio, calculate_information_ratio
+from functools import partial
 from template_download_funcs import get_test_file_content, get_bell_file_content
-from export import add_borders_to_tables, write_dataframes_to_excel
-from database import create_table, insert_or_update_score, fetch_scores, remove_score, backup_database, restore_database
+from result_cache import content_hash, upload_results
+from export_jobs import submit_export, get_job, job_result, FAILED
+from perf import span, span_summary, clear_spans, ENABLED as PERF_ENABLED, LOG_PATH as PERF_LOG_PATH
+from database import create_table, sync_fund_returns, sync_fund_returns_many, fetch_score, search_scores, remove_score, start_backup, restore_database
+# pandas, openpyxl (export), pyarrow (upload_store) and plotly (bell curve) are imported by the pages and actions that
+# use them, so the first paint only pays for Streamlit
 
 st.set_page_config(
     page_title="Up-Down App",
     page_icon=":chart:",
     layout="wide"
 )
-create_table()
+
+
+# Schema setup runs once per server process instead of on every rerun
+@st.cache_resource
+def setup_database():
+    create_table()
+
+
+setup_database()
+
+
+# Sort options on the Database page, mapped to fund_scores columns
+SCORE_SORT_OPTIONS = {
+    "Final": "final_score",
+    "All Time Average": "general_comparison_average",
+    "Up Benchmark": "up_benchmark_average",
+    "Down Benchmark": "down_benchmark_average",
+    "Fund": "fund_name",
+    "Benchmark": "benchmark_name",
+}
+
+
+# A fixed seed keeps the bell curve points where they are when the page reruns
+BELL_CURVE_SEED = 0
 
 
 def display_scores_table(scores):
-    # Create a DataFrame from the scores
-    df = pd.DataFrame(scores, columns=["ID", "Fund", "Benchmark", "Ticker", "All Time Average", "Up Benchmark",
-                                       "Down Benchmark"])
+    import pandas as pd
 
-    # Calculate the Final column
-    df["Final"] = (df["Up Benchmark"] + df["Down Benchmark"]) / 2
+    # Create a DataFrame from the scores, Final is computed by SQLite
+    df = pd.DataFrame(scores, columns=["ID", "Fund", "Benchmark", "Ticker", "All Time Average", "Up Benchmark",
+                                       "Down Benchmark", "Final", "All Time p-value", "Up p-value",
+                                       "Down p-value", "Peers", "Final Peer Percentile", "Up Peer Percentile",
+                                       "Down Peer Percentile", "Peer Quartile"])
 
     # Drop the ID column for display
     df = df.drop(columns=["ID"])
@@ -50,17 +74,125 @@ def display_scores_table(scores):
     st.dataframe(df)
 
 
-def backup_database_with_progress():
-    with st.spinner('Backing up database...'):
-        backup_database()
-        time.sleep(2)  # Simulate a delay for the backup process
-        st.success('Database backup completed!')
+def score_upload(file, key):
+    # Parse and score a Test Fund upload. The result is cached by content hash, so treat it as read-only.
+    # Uploads seen before are loaded from the on-disk columnar store instead of being parsed again.
+    from data_functions import uploaded_file_check, calculate_excess_return, fund_metrics, multi_benchmark_metrics
+    from upload_store import load_upload, store_upload
+    from bootstrap import bootstrap_intervals
+    from significance import fund_p_values
+    from resampling import ingest_returns, high_frequency_tracking_error
+
+    with span('file_parse', bytes=file.size) as parse_span:
+        cached_frames = load_upload(key)
+        if cached_frames is not None:
+            pass_status, (fund_info_pd, fund_data_pd) = "pass", cached_frames
+            parse_span.add('cached', 1)
+        else:
+            pass_status, original_file_df, fund_info_pd, fund_data_pd = uploaded_file_check(file)
+            if pass_status is not None and not fund_info_pd.empty:
+                store_upload(key, fund_info_pd, fund_data_pd)
+        if pass_status is not None:
+            parse_span.add('rows', len(fund_data_pd))
+    upload = {'pass_status': pass_status, 'fund_info': fund_info_pd, 'synced': False}
+    if pass_status is None or fund_info_pd.empty:
+        return upload
+
+    # Daily or weekly uploads and price levels are compounded to monthly returns, the finer series is kept
+    with span('ingest', rows=len(fund_data_pd)):
+        ingested = ingest_returns(fund_data_pd)
+        periods_per_year = ingested.periods_per_year
+        upload.update({
+            'periods_per_year': periods_per_year,
+            'high_frequency_periods_per_year': ingested.high_frequency_periods_per_year,
+            'high_frequency_tracking_error': high_frequency_tracking_error(ingested),
+        })
+
+    # Calculate excess return
+    fund_data_pd = calculate_excess_return(ingested.data)
+
+    # Calculate every metric in one pass, the comparison tables are built from its masks when shown or exported
+    with span('metrics', rows=len(fund_data_pd)):
+        upload.update({
+            'fund_data': fund_data_pd,
+            'metrics': fund_metrics(fund_data_pd['Fund Return'], fund_data_pd['Benchmark Return'], periods_per_year),
+            'benchmark_scores': multi_benchmark_metrics(fund_info_pd, fund_data_pd, periods_per_year),
+        })
+
+    # Block bootstrap confidence intervals, with a fixed seed so the same upload always shows the same interval
+    with span('bootstrap', rows=len(fund_data_pd)):
+        upload['intervals'] = bootstrap_intervals(fund_data_pd['Fund Return'], fund_data_pd['Benchmark Return'],
+                                                  seed=0, periods_per_year=periods_per_year)
+
+    # Chance of doing at least this well by luck alone, from the on-disk null distribution cache
+    with span('p_values'):
+        upload['p_values'] = fund_p_values(upload['metrics'])
+    return upload
+
+
+# A batting average p-value as display text
+def format_p_value(p_value):
+    if p_value != p_value:
+        return "p-value: not enough history"
+    return f"p-value: {p_value:.3f}" if p_value >= 0.001 else "p-value: < 0.001"
+
+
+# A bootstrap (low, high) interval as display text
+def format_interval(interval, percent=False):
+    low, high = interval
+    if low != low or high != high:
+        return "95% CI: not enough history"
+    if percent:
+        return f"95% CI: {round(low * 100)}% to {round(high * 100)}%"
+    return f"95% CI: {low:.2f} to {high:.2f}"
+
+
+def display_removal_status():
+    # Removals run on a background thread: backup first, then the delete. Show where the current one is.
+    if 'removal_job' not in st.session_state:
+        return
+    job, fund_name = st.session_state.removal_job
+    if not job.done.is_set():
+        st.progress(job.progress, text=f"Backing up database before removing {fund_name}...")
+        st.button("Refresh status")
+        return
+
+    del st.session_state.removal_job
+    if job.error is not None:
+        st.error(f"Could not remove {fund_name}: {job.error}")
+    else:
+        st.success(f"{fund_name} has been removed and the database has been backed up to {job.filename}.")
+
+
+def display_export_status():
+    # Exports build in the background, show this session's latest one in the sidebar until it is ready
+    job = get_job(st.session_state.get('export_job_id'))
+    if job is None:
+        return
+    with st.sidebar:
+        if not job.finished:
+            st.info(f"Building {job.file_name}...")
+            st.button("Refresh export status")
+        elif job.status == FAILED:
+            st.error(f"Export failed: {job.error}")
+        else:
+            content = job_result(job.id)
+            if content is None:
+                st.warning("This export has expired. Click Export Results to build it again.")
+            else:
+                st.success('Excel file created successfully!')
+                st.download_button(
+                    label='Download Excel File',
+                    data=content,
+                    file_name=job.file_name,
+                    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
 
 
 with st.sidebar:
-    page = st.selectbox("Choose a page", ["Test Fund", "Bell Curve", "Database"])
+    page = st.selectbox("Choose a page", ["Test Fund", "Bulk Upload", "Bell Curve", "Database"])
 
-    if page == "Test Fund":
+    if page in ("Test Fund", "Bulk Upload"):
         if st.download_button(
                 label="Download Batting Template",
                 data=get_test_file_content(),
@@ -78,10 +210,16 @@ with st.sidebar:
             st.success("Download initiated!")
 
 if page == "Test Fund":
-    file = st.file_uploader("Upload your csv", type="xlsx")
+    file = st.file_uploader("Upload your csv", type=["xlsx", "csv", "parquet"])
 
     if file is not None:
-        pass_status, original_file_df, fund_info_pd, fund_data_pd = uploaded_file_check(file)
+        from data_functions import comparison_table, benchmark_score_rows
+        from rolling_functions import rolling_batting_metrics, rolling_batting_table, ROLLING_WINDOWS
+
+        # Reruns with the same file reuse the parsed frames and metrics instead of parsing and scoring again
+        upload_key = content_hash(file)
+        upload = upload_results.get_or_compute(upload_key, lambda: score_upload(file, upload_key))
+        pass_status, fund_info_pd = upload['pass_status'], upload['fund_info']
         if pass_status is None:
             st.error("Something is wrong with your sheet. Make sure you are using the template", icon="🚨")
         else:
@@ -94,43 +232,47 @@ if page == "Test Fund":
                     st.write(fund_info_pd.at[0, "Benchmark Ticker"])
 
                 st.markdown("---")
-                # Calculate excess return
-                fund_data_pd = calculate_excess_return(fund_data_pd)
-
-                # Calculate metrics
-                annualized_return_fund = calculate_annualized_return(fund_data_pd['Fund Return'])
-                annualized_return_benchmark = calculate_annualized_return(fund_data_pd['Benchmark Return'])
-                annualized_std_fund = calculate_annualized_std(fund_data_pd['Fund Return'])
-                annualized_std_benchmark = calculate_annualized_std(fund_data_pd['Benchmark Return'])
-                excess_return = annualized_return_fund - annualized_return_benchmark
-                tracking_error = calculate_tracking_error(fund_data_pd['Excess Return'])
-                sharpe_ratio_fund = calculate_sharpe_ratio(annualized_return_fund, annualized_std_fund)
-                sharpe_ratio_benchmark = calculate_sharpe_ratio(annualized_return_benchmark, annualized_std_benchmark)
-                information_ratio = calculate_information_ratio(excess_return, tracking_error)
-                information_ratio = calculate_information_ratio(excess_return, tracking_error)
-
-                general_comparison_table, general_comparison_average = all_around_batting_average(fund_data_pd)
-                up_benchmark_table, up_benchmark_average = up_benchmark_batting_average(general_comparison_table)
-                down_benchmark_table, down_benchmark_average = down_benchmark_batting_average(general_comparison_table)
+                fund_data_pd = upload['fund_data']
+                metrics = upload['metrics']
+                intervals = upload['intervals']
+                general_p_value, up_p_value, down_p_value = upload['p_values']
+                annualized_return_fund = metrics.annualized_return_fund
+                annualized_return_benchmark = metrics.annualized_return_benchmark
+                annualized_std_fund = metrics.annualized_std_fund
+                annualized_std_benchmark = metrics.annualized_std_benchmark
+                excess_return = metrics.excess_return
+                tracking_error = metrics.tracking_error
+                sharpe_ratio_fund = metrics.sharpe_ratio_fund
+                sharpe_ratio_benchmark = metrics.sharpe_ratio_benchmark
+                information_ratio = metrics.information_ratio
+                general_comparison_average = metrics.general_average
+                up_benchmark_average = metrics.up_average
+                down_benchmark_average = metrics.down_average
 
                 general_comparison_cols1, general_comparison_cols2, general_comparison_cols3 = st.columns(3)
                 with general_comparison_cols1:
                     st.header(f"All Time Performance")
                     st.subheader(f"Average: {round(general_comparison_average * 100)}%")
+                    st.caption(format_interval(intervals['general_average'], percent=True))
+                    st.caption(format_p_value(general_p_value))
                     with st.expander("View General Performance Table"):
-                        st.dataframe(general_comparison_table)
+                        st.dataframe(comparison_table(fund_data_pd, metrics))
 
                 with general_comparison_cols2:
                     st.header(f"Up Benchmark Performance")
                     st.subheader(f"Average: {round(up_benchmark_average * 100)}%")
+                    st.caption(format_interval(intervals['up_average'], percent=True))
+                    st.caption(format_p_value(up_p_value))
                     with st.expander("View Up Benchmark Table"):
-                        st.dataframe(up_benchmark_table)
+                        st.dataframe(comparison_table(fund_data_pd, metrics, metrics.up))
 
                 with general_comparison_cols3:
                     st.header(f"Down Benchmark Performance")
                     st.subheader(f"Average: {round(down_benchmark_average * 100)}%")
+                    st.caption(format_interval(intervals['down_average'], percent=True))
+                    st.caption(format_p_value(down_p_value))
                     with st.expander("View Down Benchmark Table"):
-                        st.dataframe(down_benchmark_table)
+                        st.dataframe(comparison_table(fund_data_pd, metrics, metrics.down))
 
                 with fund_info_col2:
                     st.header("Average")
@@ -148,8 +290,15 @@ if page == "Test Fund":
                     st.write(f"Annualized STD (Fund): {annualized_std_fund:.2%}")
                     st.write(f"Excess Return (Fund): {excess_return:.2%}")
                     st.write(f"Tracking Error (Fund): {tracking_error:.2%}")
-                    st.write(f"Sharpe Ratio (Fund): {sharpe_ratio_fund:.2f}")
-                    st.write(f"Information Ratio (Fund): {information_ratio:.2f}")
+                    if upload['high_frequency_tracking_error'] is not None:
+                        from resampling import frequency_name
+
+                        st.write(f"{frequency_name(upload['high_frequency_periods_per_year'])} Tracking Error "
+                                 f"(Fund): {upload['high_frequency_tracking_error']:.2%}")
+                    st.write(f"Sharpe Ratio (Fund): {sharpe_ratio_fund:.2f} "
+                             f"({format_interval(intervals['sharpe_ratio_fund'])})")
+                    st.write(f"Information Ratio (Fund): {information_ratio:.2f} "
+                             f"({format_interval(intervals['information_ratio'])})")
 
                 with excess_cols2:
                     # Display excess return data
@@ -165,82 +314,180 @@ if page == "Test Fund":
                     with st.expander("View Excess Return Table"):
                         st.dataframe(fund_data_pd[['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']])
 
-                # Insert or update scores in the database
-                insert_or_update_score(
-                    fund_info_pd.at[0, "Fund Name"],
-                    fund_info_pd.at[0, "Benchmark Name"],
-                    fund_info_pd.at[0, "Benchmark Ticker"],
-                    general_comparison_average,
-                    up_benchmark_average,
-                    down_benchmark_average
-                )
+                benchmark_scores = upload['benchmark_scores']
+                if len(benchmark_scores) > 1:
+                    st.markdown("---")
+                    st.header("Benchmark Comparison")
+                    st.dataframe(benchmark_scores, hide_index=True)
+
+                st.markdown("---")
+                st.header("Rolling Performance")
+                rolling_window = st.selectbox("Rolling window (months)", ROLLING_WINDOWS)
+                with span('rolling_metrics', rows=len(fund_data_pd)):
+                    rolling_data = rolling_batting_metrics(fund_data_pd, rolling_window, upload['periods_per_year'])
+                if rolling_data.empty:
+                    st.write(f"Not enough history for a {rolling_window} month window.")
+                else:
+                    rolling_data = rolling_data.set_index('Date')
+                    rolling_cols1, rolling_cols2 = st.columns(2)
+                    with rolling_cols1:
+                        st.subheader("Rolling Batting Averages")
+                        st.line_chart(rolling_data[['All Time Average', 'Up Benchmark', 'Down Benchmark']])
+                    with rolling_cols2:
+                        st.subheader("Rolling Tracking Error and Information Ratio")
+                        st.line_chart(rolling_data[['Tracking Error', 'Information Ratio']])
+
+                # Store the return history and rescore from the running aggregates, only new or revised months are
+                # written. The per-benchmark scores go in the same transaction.
+                # Skipped on reruns once this upload is stored, unless the fund has since been removed.
+                if not upload['synced'] or fetch_score(fund_info_pd.at[0, "Fund Name"]) is None:
+                    with span('database_upsert', rows=len(fund_data_pd)):
+                        sync_fund_returns(
+                            fund_info_pd.at[0, "Fund Name"],
+                            fund_info_pd.at[0, "Benchmark Name"],
+                            fund_info_pd.at[0, "Benchmark Ticker"],
+                            fund_data_pd['Date'],
+                            fund_data_pd['Fund Return'],
+                            fund_data_pd['Benchmark Return'],
+                            benchmark_score_rows(benchmark_scores)
+                        )
+                    upload['synced'] = True
 
                 if st.sidebar.button('Export Results'):
-                    df1, df2, df3 = general_comparison_table, up_benchmark_table, down_benchmark_table
+                    from export import fund_results_workbook
+
                     fund_name = fund_info_pd.at[0, "Fund Name"]
                     benchmark_name = fund_info_pd.at[0, "Benchmark Name"]
                     file_path = f'{fund_name}_vs_{benchmark_name}_results.xlsx'
 
-                    # Create the excess return data DataFrame
-                    excess_return_data = fund_data_pd[['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']]
-
-                    # Create the final scores DataFrame
-                    final_scores = pd.DataFrame({
-                        "Metric": ["Annualized Return (Fund)", "Annualized Return (Benchmark)",
-                                   "Annualized STD (Fund)", "Annualized STD (Benchmark)",
-                                   "Excess Return", "Tracking Error", "Sharpe Ratio (Fund)",
-                                   "Sharpe Ratio (Benchmark)", "Information Ratio", "Up Batting Average","Down Batting Average", "All Time Batting Average","Final Batting Average"],
-                        "Value": [annualized_return_fund, annualized_return_benchmark, annualized_std_fund,
-                                  annualized_std_benchmark,
-                                  excess_return, tracking_error, sharpe_ratio_fund, sharpe_ratio_benchmark,
-                                  information_ratio,up_benchmark_average,down_benchmark_average,general_comparison_average,full_average]
-                    })
-
-                    # Write DataFrames and add borders
-                    write_dataframes_to_excel(df1, df2, df3, general_comparison_average, up_benchmark_average,
-                                              down_benchmark_average, fund_name, benchmark_name,file_path, excess_return_data,
-                                              final_scores)
-                    with st.sidebar:
-                        st.success('Excel file created successfully!')
-                        # Provide a link to download the file
-                        with open(file_path, 'rb') as f:
-                            st.download_button(
-                                label='Download Excel File',
-                                data=f,
-                                file_name=file_path,
-                                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                            )
+                    # Build the styled workbook on the export pool; the bytes stay in memory for the download.
+                    # The cached upload frames are only read, so the job can share them with this session.
+                    periods_per_year = upload['periods_per_year']
+
+                    def build_export():
+                        rolling_table = rolling_batting_table(fund_data_pd, periods_per_year=periods_per_year)
+                        return fund_results_workbook(fund_data_pd, metrics, fund_name, benchmark_name,
+                                                     rolling_data=rolling_table, intervals=intervals)
+
+                    st.session_state.export_job_id = submit_export(file_path, build_export).id
+
+                display_export_status()
             else:
                 st.error("The file is empty. Please check the uploaded file.")
 
+elif page == "Bulk Upload":
+    import pandas as pd
+    from bulk_upload import expand_uploads, score_workbooks, return_series_items, benchmark_score_items, \
+        export_results_book
+
+    uploaded_files = st.file_uploader("Upload template workbooks or a zip of them", type=["xlsx", "csv", "parquet", "zip"],
+                                      accept_multiple_files=True)
+    worker_count = st.number_input("Worker processes", min_value=1, max_value=64, value=os.cpu_count() or 1)
+    build_book = st.checkbox("Build one results workbook with every fund")
+
+    if uploaded_files and st.button("Score Files"):
+        workbooks = expand_uploads([(uploaded.name, uploaded.getvalue()) for uploaded in uploaded_files])
+        progress_bar = st.progress(0.0, text=f"Scoring {len(workbooks)} files...")
+        error_placeholder = st.empty()
+        errors = []
+
+        def report_progress(done, total, result):
+            progress_bar.progress(done / total, text=f"Scored {done} of {total}: {result['file']}")
+            if result['status'] != 'ok':
+                errors.append(result)
+                error_placeholder.error(f"{len(errors)} file(s) failed, latest: {result['file']} ({result['error']})")
+
+        results = score_workbooks(workbooks, max_workers=int(worker_count), progress_callback=report_progress)
+
+        # Store every successful return history and score in one transaction
+        items = return_series_items(results)
+        if items:
+            sync_fund_returns_many(items, benchmark_score_items(results))
+        st.success(f"Saved {len(items)} of {len(results)} funds to the database.")
+
+        results_df = pd.DataFrame(results).drop(columns=['dates', 'fund_returns', 'benchmark_returns',
+                                                         'benchmark_scores'], errors='ignore')
+        st.dataframe(results_df)
+
+        if build_book and items:
+            # Streamed in the background like the Test Fund export, one fund's sheets at a time
+            st.session_state.export_job_id = submit_export('bulk_upload_results.xlsx',
+                                                           partial(export_results_book, results)).id
+
+    display_export_status()
+
 elif page == "Bell Curve":
-    from bell_curve_funcs import process_uploaded_data, process_database_data
+    from bell_curve_funcs import process_uploaded_data, process_database_data, process_cached_upload_data
     from bell_curve_charts import create_bell_curve_chart
 
-    data_source = st.radio("Select Data Source", ("Upload File", "Database"))
+    data_source = st.radio("Select Data Source", ("Upload File", "Database", "Cached Uploads"))
 
     if data_source == "Upload File":
-        funds_file = st.file_uploader("Upload your csv", type="xlsx")
+        funds_file = st.file_uploader("Upload your csv", type=["xlsx", "csv", "parquet"])
         if funds_file is not None:
             df, mean, std_dev = process_uploaded_data(funds_file)
-            fig = create_bell_curve_chart(df, mean, std_dev)
+            with span('chart_build', rows=len(df)):
+                fig = create_bell_curve_chart(df, mean, std_dev, seed=BELL_CURVE_SEED)
             st.plotly_chart(fig)
     elif data_source == "Database":
-        df, mean, std_dev = process_database_data()
-        fig = create_bell_curve_chart(df, mean, std_dev)
+        from database import score_quantiles, SCORE_HISTOGRAM_BINS
+
+        df, mean, std_dev = process_database_data(seed=BELL_CURVE_SEED)
+        with span('chart_build', rows=len(df)):
+            fig = create_bell_curve_chart(df, mean, std_dev, seed=BELL_CURVE_SEED)
         st.plotly_chart(fig)
+        # Quartiles of every stored fund, not just the plotted sample, read from the histogram sketch
+        lower_quartile, median, upper_quartile = score_quantiles([0.25, 0.5, 0.75])
+        if median == median:
+            st.caption(f"Final score median: {median:.0%}, middle half: {lower_quartile:.0%} to "
+                       f"{upper_quartile:.0%} (to within {1 / SCORE_HISTOGRAM_BINS:.0%})")
+    elif data_source == "Cached Uploads":
+        df, mean, std_dev = process_cached_upload_data()
+        if len(df) < 2:
+            st.info("The bell curve needs at least two cached uploads. Test more funds to add them.")
+        else:
+            with span('chart_build', rows=len(df)):
+                fig = create_bell_curve_chart(df, mean, std_dev, seed=BELL_CURVE_SEED)
+            st.plotly_chart(fig)
 
 elif page == "Database":
+    display_removal_status()
+
     search_term = st.text_input("Search for a Fund or Benchmark:")
+    sort_col1, sort_col2, sort_col3 = st.columns(3)
+    with sort_col1:
+        sort_label = st.selectbox("Sort by", list(SCORE_SORT_OPTIONS))
+    with sort_col2:
+        descending = st.radio("Order", ("Descending", "Ascending"), horizontal=True) == "Descending"
+    with sort_col3:
+        page_size = st.selectbox("Rows per page", (25, 50, 100, 250), index=1)
+
+    # Keyset pagination: keep a stack of page cursors, and start over whenever the query changes
+    score_query = (search_term, sort_label, descending, page_size)
+    if st.session_state.get('score_query') != score_query:
+        st.session_state.score_query = score_query
+        st.session_state.score_cursors = [None]
 
-    scores = fetch_scores()
+    def next_scores_page(cursor):
+        st.session_state.score_cursors.append(cursor)
 
-    if search_term:
-        scores = [score for score in scores if
-                  search_term.lower() in score[1].lower() or search_term.lower() in score[2].lower()]
+    def previous_scores_page():
+        st.session_state.score_cursors.pop()
+
+    scores, next_cursor = search_scores(search_term, SCORE_SORT_OPTIONS[sort_label], descending,
+                                        after=st.session_state.score_cursors[-1], limit=page_size)
 
     display_scores_table(scores)
 
+    page_col1, page_col2, page_col3 = st.columns([1, 1, 4])
+    with page_col1:
+        st.button("Previous page", on_click=previous_scores_page,
+                  disabled=len(st.session_state.score_cursors) == 1)
+    with page_col2:
+        st.button("Next page", on_click=next_scores_page, args=(next_cursor,), disabled=next_cursor is None)
+    with page_col3:
+        st.write(f"Page {len(st.session_state.score_cursors)}")
+
     selected_fund = st.selectbox("Select a Fund to Remove", [score[1] for score in scores])
 
     # Initialize session state for confirmation
@@ -254,25 +501,41 @@ elif page == "Database":
         if st.session_state.confirm_remove:
             st.error("Do you really, really, wanna do this?")
             if st.button("Yes I'm ready to rumble"):
-                backup_database_with_progress()
-                remove_score(selected_fund)
-                st.success(f"{selected_fund} has been removed and the database has been backed up.")
-                # Refresh the scores table
-                scores = fetch_scores()
-                display_scores_table(scores)
+                # Back up and delete in the background so the page stays responsive
+                st.session_state.removal_job = (start_backup(on_complete=partial(remove_score, selected_fund)),
+                                                selected_fund)
                 # Reset confirmation state
                 st.session_state.confirm_remove = False
+                st.rerun()
         # Restore database section
         st.header("Restore Database from Backup")
-        backups = sorted([f for f in os.listdir('backups') if f.startswith('funds_scores_backup_')])
+        backups = sorted([f for f in os.listdir('backups')
+                          if f.startswith('funds_scores_backup_') and f.endswith('.db')])
         selected_backup = st.selectbox("Select a Backup to Restore", backups)
 
         if st.button("Restore Selected Backup"):
-            restore_database(selected_backup)
-            st.success(f"Database restored from {selected_backup}")
+            if restore_database(selected_backup):
+                st.success(f"Database restored from {selected_backup}")
+            else:
+                st.error(f"{selected_backup} could not be restored (missing or failed its integrity check), "
+                         f"the database was not changed.")
             # Refresh the scores table
-            scores = fetch_scores()
+            scores, next_cursor = search_scores(search_term, SCORE_SORT_OPTIONS[sort_label], descending,
+                                                limit=page_size)
             display_scores_table(scores)
     st.markdown("---")
     st.header("Database Backups")
     display_backup_files()
+
+# Per-stage timings for this server process, shown only when BATTING_PERF is set
+if PERF_ENABLED:
+    import pandas as pd
+
+    with st.sidebar.expander("Performance"):
+        summary = span_summary()
+        if summary:
+            st.dataframe(pd.DataFrame.from_dict(summary, orient='index'))
+        else:
+            st.write("No spans recorded yet.")
+        st.caption(f"Every span is also appended to {PERF_LOG_PATH}")
+        st.button("Clear timings", on_click=clear_spans)
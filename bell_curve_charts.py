@@ -1,32 +1,37 @@
 import numpy as np
 import plotly.graph_objects as go
 
-def create_bell_curve_chart(df, mean, std_dev):
+# Above this many funds the data points are drawn with WebGL and only the top funds get a text label
+WEBGL_POINT_THRESHOLD = 1000
+LABEL_TOP_N = 25
+
+
+def create_bell_curve_chart(df, mean, std_dev, seed=None, webgl_threshold=WEBGL_POINT_THRESHOLD,
+                            label_top_n=LABEL_TOP_N):
     # Generate data for the bell curve
     x = np.linspace(mean - 3*std_dev, mean + 3*std_dev, 100)
     y = (1 / (std_dev * np.sqrt(2 * np.pi))) * np.exp(-0.5 * ((x - mean) / std_dev) ** 2)
 
     # Calculate the density of the bell curve at the data points
-    density_at_points = (1 / (std_dev * np.sqrt(2 * np.pi))) * np.exp(-0.5 * ((df['Final'] - mean) / std_dev) ** 2)
+    final_scores = df['Final'].to_numpy(dtype=np.float64)
+    density_at_points = (1 / (std_dev * np.sqrt(2 * np.pi))) * np.exp(-0.5 * ((final_scores - mean) / std_dev) ** 2)
 
-    # Ensure points are placed within the density range and do not overlap vertically
-    points_with_jitter = []
-    for i in range(len(df)):
-        while True:
-            jitter = np.random.uniform(-2000 * std_dev, 2000 * std_dev)  # Increased jitter range for better separation
-            new_y = density_at_points[i] - jitter  # Ensure points are under the curve
-            if 0 <= new_y <= density_at_points[i]:
-                points_with_jitter.append((df['Final'][i], new_y))
-                break
+    # Place every point uniformly between the axis and the curve in one draw. Pass a seed to keep the layout
+    # stable between reruns.
+    rng = np.random.default_rng(seed)
+    jittered_x = final_scores
+    jittered_y = density_at_points * rng.random(len(final_scores))
 
-    jittered_x, jittered_y = zip(*points_with_jitter) if points_with_jitter else ([], [])
+    # Rank by 'Final' to identify the top 3 points
+    ranking = np.argsort(-final_scores, kind='stable')
+    is_top_3 = np.zeros(len(final_scores), dtype=bool)
+    is_top_3[ranking[:3]] = True
 
-    # Sort the DataFrame by 'Final' to identify the top 3 points
-    df_sorted = df.sort_values(by='Final', ascending=False)
-    top_3_indices = df_sorted.head(3).index
-
-    # Color data points: top 3 green, rest red
-    colors = ['green' if i in top_3_indices else 'red' for i in df.index]
+    # Color data points: top 3 green, rest red. A two-step colorscale over 0/1 keeps plotly from validating
+    # one color string per point.
+    colors = dict(color=is_top_3.astype(np.int8), colorscale=[[0, 'red'], [0.5, 'red'], [0.5, 'green'], [1, 'green']],
+                  cmin=0, cmax=1)
+    fund_names = df['Fund'].to_numpy()
 
     # Create the bell curve plot
     bell_curve = go.Scatter(
@@ -47,15 +52,36 @@ def create_bell_curve_chart(df, mean, std_dev):
     )
 
     # Create the data points plot with category names as text
-    data_points = go.Scatter(
-        x=jittered_x,
-        y=jittered_y,  # Use adjusted y-values
-        mode='markers+text',
-        name='Data Points',
-        marker=dict(color=colors, size=10),
-        text=df['Fund'],
-        textposition='top center'
-    )
+    if len(final_scores) <= webgl_threshold:
+        data_points = [go.Scatter(
+            x=jittered_x,
+            y=jittered_y,  # Use adjusted y-values
+            mode='markers+text',
+            name='Data Points',
+            marker=dict(size=10, **colors),
+            text=fund_names,
+            textposition='top center'
+        )]
+    else:
+        # Large universes: WebGL markers with the fund name on hover, and text labels for the top funds only
+        labelled = ranking[:label_top_n]
+        data_points = [go.Scattergl(
+            x=jittered_x,
+            y=jittered_y,
+            mode='markers',
+            name='Data Points',
+            marker=dict(size=6, **colors),
+            hovertext=fund_names,
+            hoverinfo='text+x'
+        ), go.Scatter(
+            x=jittered_x[labelled],
+            y=jittered_y[labelled],
+            mode='text',
+            name=f'Top {label_top_n}',
+            text=fund_names[labelled],
+            textposition='top center',
+            hoverinfo='skip'
+        )]
 
     # Create shaded areas for standard deviations
     shading = []
@@ -90,7 +116,7 @@ def create_bell_curve_chart(df, mean, std_dev):
     ) for line in vertical_lines]
 
     # Combine all plots into a figure
-    fig = go.Figure(data=[bell_curve, data_points, mean_point] + shading + lines)
+    fig = go.Figure(data=[bell_curve] + data_points + [mean_point] + shading + lines)
 
     # Update layout
     fig.update_layout(
@@ -1,17 +1,16 @@
 import pandas as pd
-from database import fetch_scores
+from database import fetch_score_distribution, fetch_chart_points
+from bell_curve_charts import LABEL_TOP_N
+from file_readers import read_table
+from upload_store import cached_upload_scores
 
+# Most funds drawn from the database on one chart, larger universes are sampled
+CHART_POINT_LIMIT = 5000
 
-def process_uploaded_data(file):
-    # Read the Excel file into a DataFrame
-    df = pd.read_excel(file)
-
-    # Make sure 'Final' column exists
-    if 'Final' not in df.columns:
-        raise ValueError("The uploaded file must contain a 'Final' column")
 
-    if 'Fund' not in df.columns:
-        raise ValueError("The uploaded file must contain a 'Fund' column")
+def process_uploaded_data(file):
+    # Read only the columns the chart needs, from an Excel, CSV or Parquet file
+    df = read_table(file, ['Fund', 'Final'])
 
     # Calculate the mean and standard deviation
     mean = df['Final'].mean()
@@ -20,18 +19,19 @@ def process_uploaded_data(file):
     return df, mean, std_dev
 
 
-def process_database_data():
-    scores = fetch_scores()
+def process_database_data(point_limit=CHART_POINT_LIMIT, seed=None):
+    # Mean and standard deviation come from the running statistics, and only the points the chart draws are read
+    count, mean, std_dev = fetch_score_distribution()
+    points = fetch_chart_points(limit=point_limit, top_n=LABEL_TOP_N, seed=seed)
 
-    # Create a DataFrame from the scores
-    df = pd.DataFrame(scores, columns=["ID", "Fund", "Benchmark", "Ticker", "All Time Average", "Up Benchmark",
-                                       "Down Benchmark"])
+    df = pd.DataFrame(points, columns=["Fund", "Final"])
+
+    return df, mean, std_dev
 
-    # Calculate the Final column
-    df["Final"] = (df["Up Benchmark"] + df["Down Benchmark"]) / 2
 
-    # Drop unnecessary columns for bell curve calculation
-    df = df.drop(columns=["ID", "Benchmark", "Ticker", "All Time Average", "Up Benchmark", "Down Benchmark"])
+def process_cached_upload_data():
+    # Score every upload in the local columnar cache, including funds that were never saved to the database
+    df = cached_upload_scores()[["Fund", "Final"]]
 
     # Calculate the mean and standard deviation
     mean = df['Final'].mean()
@@ -0,0 +1,246 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Default workload: a 10-year history and a 500-fund database
+DEFAULT_MONTHS = 120
+DEFAULT_FUNDS = 500
+DEFAULT_REPEAT = 5
+DEFAULT_OUTPUT = 'benchmark_results.json'
+# Business days in the 20-year daily history the resampling benchmark uses
+DAILY_HISTORY_DAYS = 20 * 261
+
+
+# Synthetic monthly returns, funds x months, with a benchmark every fund loosely tracks. Same seed, same data.
+def make_return_series(months=DEFAULT_MONTHS, funds=1, seed=0):
+    rng = np.random.default_rng(seed)
+    benchmark_returns = rng.normal(0.006, 0.04, months)
+    fund_returns = benchmark_returns + rng.normal(0.0005, 0.01, (funds, months))
+    dates = pd.date_range(end='2024-12-31', periods=months, freq='ME')
+    return dates, fund_returns, benchmark_returns
+
+
+# Fund Info and Data frames shaped like Batting_Average_Template.xlsx
+def make_template_frames(months=DEFAULT_MONTHS, seed=0, fund_name='Benchmark Fund'):
+    dates, fund_returns, benchmark_returns = make_return_series(months, 1, seed)
+    fund_info = pd.DataFrame({"Fund Name": [fund_name], "Benchmark Name": ["Synthetic Index"],
+                              "Benchmark Ticker": ["SYN"]})
+    fund_data = pd.DataFrame({"Date": dates, "Fund Return": fund_returns[0], "Benchmark Return": benchmark_returns})
+    return fund_info, fund_data
+
+
+# The template frames written as workbook bytes, ready to feed to uploaded_file_check
+def make_template_workbook(months=DEFAULT_MONTHS, seed=0):
+    fund_info, fund_data = make_template_frames(months, seed)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        fund_info.to_excel(writer, sheet_name='Fund Info', index=False)
+        fund_data.to_excel(writer, sheet_name='Data', index=False)
+    return buffer.getvalue()
+
+
+# Score rows for insert_or_update_score, one per synthetic fund
+def make_score_rows(funds=DEFAULT_FUNDS, seed=0):
+    rng = np.random.default_rng(seed)
+    averages = rng.uniform(0.3, 0.7, (funds, 3))
+    return [(f"Fund {i:05d}", "Synthetic Index", "SYN", *map(float, averages[i])) for i in range(funds)]
+
+
+# Run fn `repeat` times after one warm-up call and summarize the wall times in seconds
+def time_call(fn, repeat=DEFAULT_REPEAT):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings), 'runs': repeat}
+
+
+def bench_upload(months, repeat):
+    from data_functions import uploaded_file_check
+
+    content = make_template_workbook(months)
+    return time_call(lambda: uploaded_file_check(io.BytesIO(content)), repeat)
+
+
+def bench_metrics(months, repeat):
+    from data_functions import fund_metrics, calculate_excess_return, all_around_batting_average, \
+        up_benchmark_batting_average, down_benchmark_batting_average, calculate_annualized_return, \
+        calculate_annualized_std, calculate_tracking_error
+
+    fund_data = calculate_excess_return(make_template_frames(months)[1])
+
+    def per_function():
+        general_table, _ = all_around_batting_average(fund_data.copy())
+        up_benchmark_batting_average(general_table)
+        down_benchmark_batting_average(general_table)
+        for column in ('Fund Return', 'Benchmark Return'):
+            calculate_annualized_return(fund_data[column])
+            calculate_annualized_std(fund_data[column])
+        calculate_tracking_error(fund_data['Excess Return'])
+
+    return {
+        'fund_metrics': time_call(lambda: fund_metrics(fund_data['Fund Return'], fund_data['Benchmark Return']),
+                                  repeat),
+        'per_function': time_call(per_function, repeat),
+    }
+
+
+def bench_export(months, repeat):
+    from data_functions import calculate_excess_return, fund_metrics, comparison_table
+    from export import write_dataframes_to_excel
+
+    fund_data = calculate_excess_return(make_template_frames(months)[1])
+    metrics = fund_metrics(fund_data['Fund Return'], fund_data['Benchmark Return'])
+    final_scores = pd.DataFrame({"Metric": ["Tracking Error", "Information Ratio"],
+                                 "Value": [metrics.tracking_error, metrics.information_ratio]})
+
+    def export():
+        write_dataframes_to_excel(comparison_table(fund_data, metrics),
+                                  comparison_table(fund_data, metrics, metrics.up),
+                                  comparison_table(fund_data, metrics, metrics.down),
+                                  metrics.general_average, metrics.up_average, metrics.down_average,
+                                  "Benchmark Fund", "Synthetic Index",
+                                  fund_data[['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']],
+                                  final_scores)
+
+    return time_call(export, repeat)
+
+
+def bench_database(funds, repeat):
+    import database
+
+    rows = make_score_rows(funds)
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the module at a scratch database so the real one is never touched
+        original_path = database.DB_PATH
+        database.DB_PATH = os.path.join(directory, 'benchmark.db')
+        try:
+            def insert_each():
+                for row in rows:
+                    database.insert_or_update_score(*row)
+
+            results = {
+                'insert_or_update_score': time_call(insert_each, repeat),
+                'insert_or_update_scores': time_call(lambda: database.insert_or_update_scores(rows), repeat),
+                'fetch_scores': time_call(database.fetch_scores, repeat),
+            }
+        finally:
+            database.close_connection()
+            database.DB_PATH = original_path
+    return results
+
+
+def bench_bell_curve(funds, repeat):
+    from bell_curve_charts import create_bell_curve_chart
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'Fund': [f"Fund {i:05d}" for i in range(funds)], 'Final': rng.uniform(0.3, 0.7, funds)})
+    mean, std_dev = df['Final'].mean(), df['Final'].std()
+    return time_call(lambda: create_bell_curve_chart(df, mean, std_dev, seed=0), repeat)
+
+
+# Compound 20 years of business-day returns for `funds` funds to monthly, all funds in one matrix
+def bench_resample(funds, repeat):
+    from resampling import compound_returns, ingest_returns
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end='2024-12-31', periods=DAILY_HISTORY_DAYS)
+    daily_returns = rng.normal(0.0003, 0.01, (funds, len(dates)))
+    daily_frame = pd.DataFrame({"Date": dates, "Fund Price": 100 * np.cumprod(1 + daily_returns[0]),
+                                "Benchmark Price": 100 * np.cumprod(1 + daily_returns[-1])})
+    return {
+        'compound_returns': time_call(lambda: compound_returns(dates.to_numpy(), daily_returns), repeat),
+        'ingest_returns': time_call(lambda: ingest_returns(daily_frame), repeat),
+    }
+
+
+# Modules timed by the import report. 'app startup' is what app.py imports before the first paint.
+IMPORT_REPORT_MODULES = {
+    'app startup': ['streamlit', 'template_download_funcs', 'result_cache', 'perf', 'database'],
+    'streamlit': ['streamlit'],
+    'pandas': ['pandas'],
+    'numpy': ['numpy'],
+    'pyarrow': ['pyarrow'],
+    'openpyxl': ['openpyxl'],
+    'plotly': ['plotly.graph_objects'],
+    'data_functions': ['data_functions'],
+    'database': ['database'],
+    'export': ['export'],
+    'upload_store': ['upload_store'],
+    'resampling': ['resampling'],
+    'bell_curve_funcs': ['bell_curve_funcs', 'bell_curve_charts'],
+    'cli': ['cli'],
+}
+
+
+# Cold import time of each module group, each measured in a fresh interpreter so nothing is already cached
+def bench_imports(repeat):
+    import subprocess
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for label, modules in IMPORT_REPORT_MODULES.items():
+        code = ('import time; start = time.perf_counter(); '
+                + '; '.join(f'import {module}' for module in modules)
+                + '; print(time.perf_counter() - start)')
+        timings = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', code], cwd=package_dir, capture_output=True, text=True,
+                                    check=True).stdout
+            timings.append(float(output.strip().splitlines()[-1]))
+        results[label] = {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings),
+                          'runs': repeat}
+    return results
+
+
+BENCHMARKS = {
+    'imports': lambda args: bench_imports(args.repeat),
+    'uploaded_file_check': lambda args: bench_upload(args.months, args.repeat),
+    'metrics': lambda args: bench_metrics(args.months, args.repeat),
+    'write_dataframes_to_excel': lambda args: bench_export(args.months, args.repeat),
+    'database': lambda args: bench_database(args.funds, args.repeat),
+    'create_bell_curve_chart': lambda args: bench_bell_curve(args.funds, args.repeat),
+    'resample': lambda args: bench_resample(args.funds, args.repeat),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time imports and the scoring, export, database and charting hot "
+                                                 "paths.")
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS, help="length of each return series")
+    parser.add_argument('--funds', type=int, default=DEFAULT_FUNDS, help="funds in the database and bell curve")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument('--only', choices=list(BENCHMARKS), action='append', help="run just these benchmarks")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON file the results are written to")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = BENCHMARKS[name](args)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'parameters': {'months': args.months, 'funds': args.funds, 'repeat': args.repeat},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'numpy': np.__version__, 'pandas': pd.__version__},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
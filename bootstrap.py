@@ -0,0 +1,86 @@
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data_functions import batch_batting_metrics
+
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_CONFIDENCE = 0.95
+# Upper bound on the working set of one chunk. Each resample row costs about ten float64 arrays of the history length
+# inside batch_batting_metrics.
+BOOTSTRAP_CHUNK_BYTES = 64 * 1024 * 1024
+BYTES_PER_RESAMPLE_PERIOD = 10 * 8
+
+# Metrics that get an interval, keyed as in batch_batting_metrics
+INTERVAL_METRICS = ['general_average', 'up_average', 'down_average', 'sharpe_ratio_fund', 'information_ratio']
+# The month count each batting average is taken over. A resample with none of those months has no average.
+INTERVAL_COUNTS = {'general_average': 'months', 'up_average': 'up_months', 'down_average': 'down_months'}
+
+
+# Rule-of-thumb block length for monthly returns: the cube root of the history length, at least 1
+def default_block_length(periods):
+    return max(1, int(round(periods ** (1 / 3))))
+
+
+# Circular block bootstrap as one index matrix: each row is a resample of `periods` indices built from blocks of
+# consecutive months starting at random positions, wrapping around the end of the history
+def block_bootstrap_indices(periods, resamples, block_length, rng):
+    blocks = -(-periods // block_length)
+    starts = rng.integers(0, periods, size=(resamples, blocks))
+    indices = (starts[:, :, np.newaxis] + np.arange(block_length)) % periods
+    return indices.reshape(resamples, blocks * block_length)[:, :periods]
+
+
+def _resample_chunk(fund, benchmark, resamples, block_length, seed, periods_per_year):
+    rng = np.random.default_rng(seed)
+    indices = block_bootstrap_indices(len(fund), resamples, block_length, rng)
+    metrics = batch_batting_metrics(fund[indices], benchmark[indices], periods_per_year)
+    for name, count in INTERVAL_COUNTS.items():
+        # batch_batting_metrics scores an empty bucket 0, which would drag the interval down
+        metrics[name] = np.where(metrics[count] > 0, metrics[name], np.nan)
+    return np.column_stack([metrics[name] for name in INTERVAL_METRICS])
+
+
+# Percentile confidence intervals from a block bootstrap of the fund and benchmark returns, resampled together so
+# each resample keeps months paired. Returns {metric: (low, high)} for every name in INTERVAL_METRICS, (nan, nan)
+# when there is not enough history for a metric, e.g. an up average for a history without up benchmark months.
+# Months missing either return are left out before resampling.
+# Resamples run in chunks of at most BOOTSTRAP_CHUNK_BYTES; with workers > 1 the chunks are spread over a process
+# pool. Every chunk has its own seed spawned from `seed`, so results do not depend on the number of workers.
+def bootstrap_intervals(fund_returns, benchmark_returns, resamples=BOOTSTRAP_RESAMPLES,
+                        confidence=BOOTSTRAP_CONFIDENCE, block_length=None, seed=None, workers=None,
+                        periods_per_year=12):
+    fund = np.ascontiguousarray(fund_returns, dtype=np.float64)
+    benchmark = np.ascontiguousarray(benchmark_returns, dtype=np.float64)
+    complete = ~(np.isnan(fund) | np.isnan(benchmark))
+    if not complete.all():
+        fund = fund[complete]
+        benchmark = benchmark[complete]
+    periods = len(fund)
+    if periods < 2:
+        return {name: (np.nan, np.nan) for name in INTERVAL_METRICS}
+    block_length = block_length or default_block_length(periods)
+
+    chunk_size = max(1, BOOTSTRAP_CHUNK_BYTES // (periods * BYTES_PER_RESAMPLE_PERIOD))
+    chunk_sizes = [min(chunk_size, resamples - start) for start in range(0, resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    jobs = [(fund, benchmark, size, block_length, chunk_seed, periods_per_year)
+            for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        # spawn rather than fork, same as bulk scoring: the Streamlit server is multi-threaded
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as executor:
+            chunks = list(executor.map(_resample_chunk, *zip(*jobs)))
+    else:
+        chunks = [_resample_chunk(*job) for job in jobs]
+
+    samples = np.concatenate(chunks)
+    tail = (1 - confidence) / 2 * 100
+    # Resamples without any spread give infinite ratios, leave them out of the percentiles
+    samples[~np.isfinite(samples)] = np.nan
+    with warnings.catch_warnings():
+        # A metric no resample could score has no interval, nanpercentile gives NaN for it
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lows, highs = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return {name: (float(low), float(high)) for name, low, high in zip(INTERVAL_METRICS, lows, highs)}
@@ -0,0 +1,163 @@
+import io
+import os
+import re
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_functions import uploaded_file_check, fund_metrics, calculate_excess_return, multi_benchmark_metrics, \
+    benchmark_score_rows
+from rolling_functions import rolling_batting_table
+from file_readers import SUPPORTED_EXTENSIONS
+from resampling import ingest_returns, high_frequency_tracking_error
+
+
+# Turn a mix of .xlsx/.csv/.parquet and .zip uploads into a flat list of (name, bytes) workbooks
+def expand_uploads(uploads):
+    workbooks = []
+    for name, content in uploads:
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for member in archive.infolist():
+                    member_name = os.path.basename(member.filename)
+                    # Skip folders and the lock/metadata files Excel and macOS leave behind
+                    if member.is_dir() or not member_name.lower().endswith(SUPPORTED_EXTENSIONS) or \
+                            member_name.startswith(('~$', '._')):
+                        continue
+                    workbooks.append((member.filename, archive.read(member)))
+        else:
+            workbooks.append((name, content))
+    return workbooks
+
+
+# Parse and score one template workbook. Runs inside a worker process, so it only takes and returns plain data.
+# With export_dir set the worker also writes the fund's results workbook there, the same one the Test Fund page exports.
+def score_workbook(name, content, export_dir=None):
+    result = {'file': name, 'status': 'error', 'error': None}
+    try:
+        upload = io.BytesIO(content)
+        # The reader picks xlsx/csv/parquet from the name
+        upload.name = name
+        pass_status, original_file_df, fund_info, fund_data = uploaded_file_check(upload)
+        if pass_status is None:
+            result['error'] = "Not a Batting Average template"
+            return result
+        if fund_info.empty or fund_data.empty:
+            result['error'] = "The file is empty"
+            return result
+
+        # Daily, weekly and price uploads are compounded to monthly returns first
+        ingested = ingest_returns(fund_data)
+        fund_data = ingested.data
+        metrics = fund_metrics(fund_data['Fund Return'], fund_data['Benchmark Return'], ingested.periods_per_year)
+
+        result.update({
+            'status': 'ok',
+            'fund_name': fund_info.at[0, "Fund Name"],
+            'benchmark_name': fund_info.at[0, "Benchmark Name"],
+            'benchmark_ticker': fund_info.at[0, "Benchmark Ticker"],
+            'general_comparison_average': float(metrics.general_average),
+            'up_benchmark_average': float(metrics.up_average),
+            'down_benchmark_average': float(metrics.down_average),
+            'dates': list(fund_data['Date']),
+            'fund_returns': fund_data['Fund Return'].to_numpy(dtype=float),
+            'benchmark_returns': fund_data['Benchmark Return'].to_numpy(dtype=float),
+            'benchmark_scores': benchmark_score_rows(multi_benchmark_metrics(fund_info, fund_data,
+                                                                             ingested.periods_per_year)),
+            'periods_per_year': ingested.periods_per_year,
+            'high_frequency_tracking_error': high_frequency_tracking_error(ingested),
+        })
+        if export_dir is not None:
+            result['export'] = export_results(fund_info, fund_data, metrics, export_dir, ingested.periods_per_year)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# Write {fund}_vs_{benchmark}_results.xlsx into export_dir and return its path
+def export_results(fund_info, fund_data, metrics, export_dir, periods_per_year=12):
+    # openpyxl is only loaded by workers that actually export
+    from export import fund_results_workbook
+    from bootstrap import bootstrap_intervals
+
+    fund_name = fund_info.at[0, "Fund Name"]
+    benchmark_name = fund_info.at[0, "Benchmark Name"]
+    file_name = re.sub(r'[^\w\- .]', '_', f'{fund_name}_vs_{benchmark_name}_results') + '.xlsx'
+    path = os.path.join(export_dir, file_name)
+
+    fund_data = calculate_excess_return(fund_data)
+    intervals = bootstrap_intervals(fund_data['Fund Return'], fund_data['Benchmark Return'], seed=0,
+                                    periods_per_year=periods_per_year)
+    buffer = fund_results_workbook(fund_data, metrics, fund_name, benchmark_name,
+                                   rolling_data=rolling_batting_table(fund_data, periods_per_year=periods_per_year),
+                                   intervals=intervals)
+    with open(path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    return path
+
+
+# stream_fund_sheets arguments for every scored fund, built one fund at a time so only one fund's tables are held
+# in memory while the book is written. The multi-fund book leaves out the bootstrap intervals, which would cost
+# seconds per fund.
+def fund_sheet_items(results):
+    import pandas as pd
+    from export import final_scores_table
+
+    for result in results:
+        if result['status'] != 'ok':
+            continue
+        fund_data = calculate_excess_return(pd.DataFrame({'Date': result['dates'],
+                                                          'Fund Return': result['fund_returns'],
+                                                          'Benchmark Return': result['benchmark_returns']}))
+        metrics = fund_metrics(fund_data['Fund Return'], fund_data['Benchmark Return'], result['periods_per_year'])
+        yield {
+            'fund_name': result['fund_name'],
+            'benchmark_name': result['benchmark_name'],
+            'fund_data_df': fund_data,
+            'general_average': metrics.general_average,
+            'up_average': metrics.up_average,
+            'down_average': metrics.down_average,
+            'final_scores': final_scores_table(metrics),
+            'rolling_data': rolling_batting_table(fund_data, periods_per_year=result['periods_per_year']),
+        }
+
+
+# One streamed workbook with the results, batting, excess and rolling sheets of every scored fund
+def export_results_book(results, output=None):
+    from export import stream_funds_to_excel
+
+    return stream_funds_to_excel(fund_sheet_items(results), output)
+
+
+# Score many workbooks across a process pool. progress_callback(done, total, result) fires as each file finishes.
+def score_workbooks(workbooks, max_workers=None, progress_callback=None, export_dir=None):
+    results = []
+    total = len(workbooks)
+    if total == 0:
+        return results
+
+    max_workers = min(max_workers or os.cpu_count() or 1, total)
+    # spawn rather than fork: the Streamlit server is multi-threaded and forking it is unsafe
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = {executor.submit(score_workbook, name, content, export_dir): name for name, content in workbooks}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'file': futures[future], 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if progress_callback is not None:
+                progress_callback(len(results), total, result)
+    return results
+
+
+# Return histories ready for database.sync_fund_returns_many
+def return_series_items(results):
+    return [(result['fund_name'], result['benchmark_name'], result['benchmark_ticker'], result['dates'],
+             result['fund_returns'], result['benchmark_returns'])
+            for result in results if result['status'] == 'ok']
+
+
+# Per-benchmark scores ready for the benchmark_items of database.sync_fund_returns_many
+def benchmark_score_items(results):
+    return [(result['fund_name'], result['benchmark_scores']) for result in results if result['status'] == 'ok']
@@ -0,0 +1,146 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+import database
+from bulk_upload import expand_uploads, score_workbooks, return_series_items, benchmark_score_items, \
+    export_results_book
+from file_readers import SUPPORTED_EXTENSIONS
+
+# Headless scoring for cron jobs and scripts. Imports nothing from Streamlit, e.g.
+#   python cli.py /data/monthly/*.xlsx --export-dir /data/exports --workers 8 > summary.json
+#   python cli.py /data/monthly --export-book /data/exports/all_funds.xlsx > summary.json
+
+UPLOAD_EXTENSIONS = SUPPORTED_EXTENSIONS + ('.zip',)
+
+# Exit codes: every file scored, some files failed, nothing to score
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_NO_INPUT = 2
+
+
+# Expand directories, globs and plain paths into the template files to score, without duplicates
+def collect_paths(inputs, recursive=False):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            matches = glob.glob(pattern, recursive=recursive)
+        else:
+            matches = glob.glob(item, recursive=recursive) or [item]
+        for path in sorted(matches):
+            # Skip the lock/metadata files Excel and macOS leave behind
+            if os.path.basename(path).startswith(('~$', '._')):
+                continue
+            if os.path.isfile(path) and path.lower().endswith(UPLOAD_EXTENSIONS):
+                paths.append(path)
+    return list(dict.fromkeys(paths))
+
+
+def read_uploads(paths):
+    uploads = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            uploads.append((path, f.read()))
+    return uploads
+
+
+# NaN and infinity are not valid JSON: blank Fund Info cells come through as NaN, and metrics without enough history
+# are NaN or infinite. They are written as null, everywhere in the summary.
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# The machine-readable result of a run, printed to stdout as JSON
+def build_summary(paths, results, stored, elapsed_seconds):
+    funds, errors = [], []
+    for result in sorted(results, key=lambda result: result['file']):
+        if result['status'] != 'ok':
+            errors.append({'file': result['file'], 'error': result['error']})
+            continue
+        funds.append({
+            'file': result['file'],
+            'fund_name': result['fund_name'],
+            'benchmark_name': result['benchmark_name'],
+            'benchmark_ticker': result['benchmark_ticker'],
+            'general_comparison_average': result['general_comparison_average'],
+            'up_benchmark_average': result['up_benchmark_average'],
+            'down_benchmark_average': result['down_benchmark_average'],
+            'final_score': (result['up_benchmark_average'] + result['down_benchmark_average']) / 2,
+            'benchmarks': [{'benchmark_name': row[0], 'general_comparison_average': row[2],
+                            'up_benchmark_average': row[3], 'down_benchmark_average': row[4]}
+                           for row in result['benchmark_scores']],
+            'periods_per_year': result['periods_per_year'],
+            'high_frequency_tracking_error': result['high_frequency_tracking_error'],
+            'export': result.get('export'),
+        })
+    return _json_safe({
+        'inputs': len(paths),
+        'workbooks': len(results),
+        'scored': len(funds),
+        'failed': len(errors),
+        'stored': stored,
+        'elapsed_seconds': round(elapsed_seconds, 3),
+        'funds': funds,
+        'errors': errors,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score Batting Average templates without the Streamlit app.")
+    parser.add_argument('inputs', nargs='+', help="template files, zips, directories or glob patterns")
+    parser.add_argument('--recursive', action='store_true', help="descend into subdirectories and ** globs")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--db', default=database.DB_PATH, help="SQLite database to upsert scores into")
+    parser.add_argument('--no-db', action='store_true', help="score only, do not touch the database")
+    parser.add_argument('--export-dir', default=None, help="also write each fund's results workbook here")
+    parser.add_argument('--export-book', default=None, help="also write one workbook with every fund's sheets")
+    parser.add_argument('--indent', type=int, default=None, help="pretty-print the JSON summary")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    paths = collect_paths(args.inputs, args.recursive)
+    if not paths:
+        print(json.dumps(build_summary(paths, [], False, time.perf_counter() - started), indent=args.indent,
+                         allow_nan=False))
+        return EXIT_NO_INPUT
+
+    if args.export_dir is not None:
+        os.makedirs(args.export_dir, exist_ok=True)
+
+    workbooks = expand_uploads(read_uploads(paths))
+
+    def report_progress(done, total, result):
+        print(f"[{done}/{total}] {result['file']}: {result['status']}", file=sys.stderr)
+
+    results = score_workbooks(workbooks, max_workers=args.workers, progress_callback=report_progress,
+                              export_dir=args.export_dir)
+
+    if args.export_book is not None:
+        export_results_book(results, args.export_book)
+
+    stored = False
+    items = return_series_items(results)
+    if items and not args.no_db:
+        # One transaction for the whole universe: return histories, running aggregates and fund_scores
+        database.DB_PATH = args.db
+        database.sync_fund_returns_many(items, benchmark_score_items(results))
+        stored = True
+
+    summary = build_summary(paths, results, stored, time.perf_counter() - started)
+    # allow_nan=False: a non-finite value that slipped past _json_safe fails loudly instead of writing bare NaN
+    print(json.dumps(summary, indent=args.indent, default=str, allow_nan=False))
+    return EXIT_FAILURES if summary['failed'] else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
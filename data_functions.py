@@ -1,36 +1,11 @@
 import pandas as pd
 import numpy as np
+from collections import namedtuple
+from file_readers import read_upload, extra_benchmark_columns, EXTRA_BENCHMARK_PREFIX
 
 def uploaded_file_check(file):
-    original_file_df = pd.ExcelFile(file)
-    imported_file_sheet_names = original_file_df.sheet_names
-
-    if 'Fund Info' not in imported_file_sheet_names:
-        return None, None, None, None
-    elif 'Data' not in imported_file_sheet_names:
-        return None, None, None, None
-    else:
-        fund_info = pd.read_excel(file, "Fund Info")
-        fund_info_cols = fund_info.columns.tolist()
-
-        if "Fund Name" not in fund_info_cols:
-            return None, None, None, None
-        elif "Benchmark Name" not in fund_info_cols:
-            return None, None, None, None
-        elif "Benchmark Ticker" not in fund_info_cols:
-            return None, None, None, None
-
-        fund_data = pd.read_excel(file, "Data")
-        fund_data_cols = fund_data.columns.tolist()
-
-        if "Date" not in fund_data_cols:
-            return None, None, None, None
-        elif "Fund Return" not in fund_data_cols:
-            return None, None, None, None
-        elif "Benchmark Return" not in fund_data_cols:
-            return None, None, None, None
-
-    return "pass", original_file_df, fund_info, fund_data
+    # Parsing lives in file_readers: one pass over the workbook, xlsx, csv or parquet
+    return read_upload(file)
 
 def all_around_batting_average(fund_data_df):
     fund_data_df['check'] = np.where(fund_data_df["Fund Return"] > fund_data_df["Benchmark Return"], 1, 0)
@@ -62,17 +37,206 @@ def calculate_excess_return(fund_data_df):
     fund_data_df['Excess Return'] = fund_data_df['Fund Return'] - fund_data_df['Benchmark Return']
     return fund_data_df
 
-def calculate_annualized_return(returns):
-    return np.prod(1 + returns) ** (12 / len(returns)) - 1
+def calculate_annualized_return(returns, periods_per_year=12):
+    return np.prod(1 + returns) ** (periods_per_year / len(returns)) - 1
 
-def calculate_annualized_std(returns):
-    return np.std(returns, ddof=1) * np.sqrt(12)
+def calculate_annualized_std(returns, periods_per_year=12):
+    return np.std(returns, ddof=1) * np.sqrt(periods_per_year)
 
-def calculate_tracking_error(excess_returns):
-    return np.std(excess_returns, ddof=0) * np.sqrt(12)
+def calculate_tracking_error(excess_returns, periods_per_year=12):
+    return np.std(excess_returns, ddof=0) * np.sqrt(periods_per_year)
 
 def calculate_sharpe_ratio(annualized_return, annualized_std):
     return annualized_return / annualized_std
 
 def calculate_information_ratio(excess_return, tracking_error):
     return excess_return / tracking_error
+
+
+def batch_batting_metrics(fund_returns, benchmark_returns, periods_per_year=12):
+    # Score many funds at once. fund_returns is a funds x periods matrix, benchmark_returns is either one shared
+    # row of periods or a matching matrix. NaN marks a missing period and is excluded from every reduction.
+    fund = np.asarray(fund_returns, dtype=np.float64)
+    benchmark = np.asarray(benchmark_returns, dtype=np.float64)
+    if fund.ndim == 1:
+        fund = fund[np.newaxis, :]
+    fund, benchmark = np.broadcast_arrays(fund, benchmark)
+
+    valid = ~(np.isnan(fund) | np.isnan(benchmark))
+    wins = fund > benchmark
+    up = valid & (benchmark > 0)
+    down = valid & (benchmark < 0)
+
+    months = valid.sum(axis=1)
+    up_months = up.sum(axis=1)
+    down_months = down.sum(axis=1)
+    win_count = (wins & valid).sum(axis=1)
+    up_wins = (wins & up).sum(axis=1)
+    down_wins = (wins & down).sum(axis=1)
+
+    fund_filled = np.where(valid, fund, 0.0)
+    benchmark_filled = np.where(valid, benchmark, 0.0)
+    excess = fund_filled - benchmark_filled
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annualized_return_fund = np.prod(1 + fund_filled, axis=1) ** (periods_per_year / months) - 1
+        annualized_return_benchmark = np.prod(1 + benchmark_filled, axis=1) ** (periods_per_year / months) - 1
+        annualized_std_fund = _batch_std(fund_filled, valid, months, ddof=1) * np.sqrt(periods_per_year)
+        annualized_std_benchmark = _batch_std(benchmark_filled, valid, months, ddof=1) * np.sqrt(periods_per_year)
+        tracking_error = _batch_std(excess, valid, months, ddof=0) * np.sqrt(periods_per_year)
+        excess_return = annualized_return_fund - annualized_return_benchmark
+
+        return {
+            'months': months,
+            'up_months': up_months,
+            'down_months': down_months,
+            'wins': win_count,
+            'up_wins': up_wins,
+            'down_wins': down_wins,
+            'general_average': _batch_ratio(win_count, months),
+            'up_average': _batch_ratio(up_wins, up_months),
+            'down_average': _batch_ratio(down_wins, down_months),
+            'annualized_return_fund': annualized_return_fund,
+            'annualized_return_benchmark': annualized_return_benchmark,
+            'annualized_std_fund': annualized_std_fund,
+            'annualized_std_benchmark': annualized_std_benchmark,
+            'excess_return': excess_return,
+            'tracking_error': tracking_error,
+            'sharpe_ratio_fund': annualized_return_fund / annualized_std_fund,
+            'sharpe_ratio_benchmark': annualized_return_benchmark / annualized_std_benchmark,
+            'information_ratio': excess_return / tracking_error,
+        }
+
+
+# Every scalar metric for one fund plus the win/up/down masks, as returned by fund_metrics
+FundMetrics = namedtuple('FundMetrics', [
+    'months', 'general_average', 'up_average', 'down_average',
+    'annualized_return_fund', 'annualized_return_benchmark', 'annualized_std_fund', 'annualized_std_benchmark',
+    'excess_return', 'tracking_error', 'sharpe_ratio_fund', 'sharpe_ratio_benchmark', 'information_ratio',
+    'wins', 'up', 'down',
+])
+
+
+def fund_metrics(fund_returns, benchmark_returns, periods_per_year=12):
+    # Single-fund kernel for the Test Fund page: one set of reductions over contiguous float64 arrays, no DataFrame
+    # copies. Gives the same numbers as the calculate_* and *_batting_average functions above. As in
+    # batch_batting_metrics, a month missing either return is left out of every statistic; the wins, up and down
+    # masks still have one entry per row, False for the missing months.
+    fund = np.ascontiguousarray(fund_returns, dtype=np.float64)
+    benchmark = np.ascontiguousarray(benchmark_returns, dtype=np.float64)
+
+    valid = ~(np.isnan(fund) | np.isnan(benchmark))
+    wins = valid & (fund > benchmark)
+    up = valid & (benchmark > 0)
+    down = valid & (benchmark < 0)
+    if not valid.all():
+        fund = fund[valid]
+        benchmark = benchmark[valid]
+    months = len(fund)
+    up_months = np.count_nonzero(up)
+    down_months = np.count_nonzero(down)
+
+    # Fund, benchmark and excess as the rows of one block, so each statistic is a single reduction over it
+    returns = np.empty((3, months))
+    returns[0] = fund
+    returns[1] = benchmark
+    np.subtract(fund, benchmark, out=returns[2])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.prod(1 + returns[:2], axis=1) ** (periods_per_year / months) - 1
+        deviations = returns - returns.mean(axis=1, keepdims=True)
+        sum_squares = np.einsum('ij,ij->i', deviations, deviations)
+        annualized_std_fund, annualized_std_benchmark = np.sqrt(sum_squares[:2] / (months - 1) * periods_per_year)
+        tracking_error = np.sqrt(sum_squares[2] / months * periods_per_year)
+
+        annualized_return_fund, annualized_return_benchmark = growth
+        excess_return = annualized_return_fund - annualized_return_benchmark
+        return FundMetrics(
+            months=months,
+            general_average=np.count_nonzero(wins) / months if months > 0 else 0,
+            up_average=np.count_nonzero(wins & up) / up_months if up_months > 0 else 0,
+            down_average=np.count_nonzero(wins & down) / down_months if down_months > 0 else 0,
+            annualized_return_fund=annualized_return_fund,
+            annualized_return_benchmark=annualized_return_benchmark,
+            annualized_std_fund=annualized_std_fund,
+            annualized_std_benchmark=annualized_std_benchmark,
+            excess_return=excess_return,
+            tracking_error=tracking_error,
+            sharpe_ratio_fund=annualized_return_fund / annualized_std_fund,
+            sharpe_ratio_benchmark=annualized_return_benchmark / annualized_std_benchmark,
+            information_ratio=excess_return / tracking_error,
+            wins=wins,
+            up=up,
+            down=down,
+        )
+
+
+# The general, up or down comparison table for a FundMetrics mask (None for every month), with the same columns
+# all_around_batting_average and friends return. Built only when a table is displayed or exported.
+def comparison_table(fund_data_df, metrics, mask=None):
+    table = fund_data_df.drop(columns=extra_benchmark_columns(fund_data_df.columns))
+    table = table.assign(check=metrics.wins.astype(np.int64))
+    return table if mask is None else table[mask]
+
+
+# Metrics shown for each benchmark in the comparison grid, display name -> batch_batting_metrics key. Also the column
+# order of the per-benchmark rows database.sync_fund_returns stores, after the benchmark name.
+BENCHMARK_SCORE_METRICS = {
+    "Months": 'months',
+    "All Time Average": 'general_average',
+    "Up Benchmark": 'up_average',
+    "Down Benchmark": 'down_average',
+    "Annualized Return (Benchmark)": 'annualized_return_benchmark',
+    "Excess Return": 'excess_return',
+    "Tracking Error": 'tracking_error',
+    "Information Ratio": 'information_ratio',
+    "Sharpe Ratio (Benchmark)": 'sharpe_ratio_benchmark',
+}
+
+
+# (benchmark name, Data column) for the primary benchmark and every "Benchmark Return <name>" column. Names are unique
+# per fund in the database, so a column whose name repeats the primary benchmark's or an earlier column's, once
+# surrounding whitespace is stripped, is left out.
+def benchmark_columns(fund_info_df, fund_data_df):
+    primary = (fund_info_df.at[0, "Benchmark Name"], "Benchmark Return")
+    columns = [primary]
+    seen = {str(primary[0]).strip()}
+    for column in extra_benchmark_columns(fund_data_df.columns):
+        name = column[len(EXTRA_BENCHMARK_PREFIX):].strip()
+        if name not in seen:
+            seen.add(name)
+            columns.append((name, column))
+    return columns
+
+
+# Score the fund against every benchmark at once: the benchmarks are the rows of one matrix and the fund's returns
+# broadcast against it, so batch_batting_metrics makes a single pass whatever the number of benchmarks.
+# One row per benchmark, primary first. Months where an extra benchmark is blank are left out of its row.
+def multi_benchmark_metrics(fund_info_df, fund_data_df, periods_per_year=12):
+    columns = benchmark_columns(fund_info_df, fund_data_df)
+    benchmarks = fund_data_df[[column for _, column in columns]].to_numpy(dtype=np.float64).T
+    metrics = batch_batting_metrics(fund_data_df['Fund Return'].to_numpy(dtype=np.float64), benchmarks,
+                                    periods_per_year)
+
+    table = pd.DataFrame({"Benchmark": [name for name, _ in columns]})
+    for label, key in BENCHMARK_SCORE_METRICS.items():
+        table[label] = metrics[key]
+    table.insert(5, "Final", (table["Up Benchmark"] + table["Down Benchmark"]) / 2)
+    return table
+
+
+# multi_benchmark_metrics as plain tuples for the benchmark rows of database.sync_fund_returns
+def benchmark_score_rows(benchmark_scores):
+    return list(benchmark_scores[["Benchmark", *BENCHMARK_SCORE_METRICS]].itertuples(index=False, name=None))
+
+
+def _batch_ratio(count, total):
+    # Same convention as the single-fund functions: an empty bucket scores 0
+    return np.divide(count, total, out=np.zeros(count.shape, dtype=np.float64), where=total > 0)
+
+
+def _batch_std(values, valid, counts, ddof):
+    # values are already zero-filled outside valid, so row sums are sums over the valid periods only
+    means = values.sum(axis=1) / counts
+    deviations = np.where(valid, values - means[:, np.newaxis], 0.0)
+    return np.sqrt(np.einsum('ij,ij->i', deviations, deviations) / (counts - ddof))
@@ -1,89 +1,893 @@
 import sqlite3
-import shutil
 import os
+import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+import numpy as np
+from significance import batting_p_values
 
-# Connect to the SQLite database (or create it if it doesn't exist)
+DB_PATH = 'funds_scores.db'
+
+# Running sums kept per fund in fund_aggregates, in the order _aggregate_deltas returns them
+AGGREGATE_COLUMNS = ['months', 'wins', 'up_months', 'up_wins', 'down_months', 'down_wins',
+                     'sum_log_fund', 'sum_log_benchmark', 'sum_fund', 'sum_sq_fund',
+                     'sum_benchmark', 'sum_sq_benchmark', 'sum_excess', 'sum_sq_excess']
+
+# One connection shared by every thread of the process. Streamlit runs each rerun on a new thread, so a per-thread
+# connection would be reopened, and lose its statement cache, on every rerun. SQLite is built serialized, so threads
+# can read through the shared connection; writes hold _write_lock so two threads never interleave statements in one
+# transaction. Connections are keyed by pid so a forked worker never reuses its parent's connection.
+_connections = {}
+_connection_lock = threading.Lock()
+_write_lock = threading.RLock()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_fts_ready = set()
+
+
+def _open_connection(path):
+    # cached_statements keeps the compiled form of every SQL string below, so each statement is prepared once
+    conn = sqlite3.connect(path, timeout=30, cached_statements=256, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')  # readers no longer block the writer
+    conn.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, skips an fsync per commit
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MiB page cache
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+# Connect to the SQLite database (or create it if it doesn't exist). Every thread of the process gets the same
+# connection, so callers must not close it, and must write through _transaction.
 def connect_db():
-    conn = sqlite3.connect('funds_scores.db')
+    key = (os.getpid(), DB_PATH)
+    conn = _connections.get(key)
+    if conn is None:
+        with _connection_lock:
+            conn = _connections.get(key)
+            if conn is None:
+                conn = _open_connection(DB_PATH)
+                _connections[key] = conn
+
+    if key not in _schema_ready:
+        with _schema_lock, _write_lock:
+            if key not in _schema_ready:
+                _create_schema(conn)
+                _schema_ready.add(key)
     return conn
 
-# Create a table to store fund scores
-def create_table():
+
+# A write transaction on the shared connection: commits when the block succeeds and rolls back when it raises
+@contextmanager
+def _transaction():
     conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS fund_scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fund_name TEXT UNIQUE,
-            benchmark_name TEXT,
-            benchmark_ticker TEXT,
-            general_comparison_average REAL,
-            up_benchmark_average REAL,
-            down_benchmark_average REAL
+    with _write_lock, conn:
+        yield conn
+
+
+# Close the process's connection to DB_PATH, the next connect_db opens a fresh one
+def close_connection():
+    with _connection_lock:
+        conn = _connections.pop((os.getpid(), DB_PATH), None)
+    if conn is not None:
+        conn.close()
+
+
+# Create the tables. Schema setup happens once per process inside connect_db, so this is cheap to call on every rerun.
+def create_table():
+    connect_db()
+
+
+# Columns the Database page can sort by
+SORT_COLUMNS = ['fund_name', 'benchmark_name', 'general_comparison_average', 'up_benchmark_average',
+                'down_benchmark_average', 'final_score']
+
+# Peer rank columns read alongside the scores, see _create_peer_ranks
+PEER_RANK_COLUMNS = ['peer_count', 'final_percent_rank', 'up_percent_rank', 'down_percent_rank', 'final_quartile']
+
+# Luck-vs-skill p-values stored next to each batting average, see significance.py
+P_VALUE_COLUMNS = ['general_p_value', 'up_p_value', 'down_p_value']
+
+# Search needs at least one full trigram, shorter terms use a LIKE scan
+TRIGRAM_MIN_LENGTH = 3
+
+AGGREGATE_COLUMN_DDL = ',\n'.join(f'            {column} REAL NOT NULL DEFAULT 0' for column in AGGREGATE_COLUMNS)
+
+
+def _create_schema(conn):
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fund_scores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fund_name TEXT UNIQUE,
+                benchmark_name TEXT,
+                benchmark_ticker TEXT,
+                general_comparison_average REAL,
+                up_benchmark_average REAL,
+                down_benchmark_average REAL
+            )
+        ''')
+        # Monthly return history, clustered on (fund, date) so per-fund date ranges are index range scans
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fund_returns (
+                fund_name TEXT NOT NULL,
+                return_date TEXT NOT NULL,
+                fund_return REAL NOT NULL,
+                benchmark_return REAL NOT NULL,
+                PRIMARY KEY (fund_name, return_date)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS fund_aggregates (
+                fund_name TEXT PRIMARY KEY,
+                benchmark_name TEXT,
+{AGGREGATE_COLUMN_DDL}
+            )
+        ''')
+
+        # The Final score is computed by SQLite, so it can be sorted on and indexed like any other column
+        score_columns = [row[1] for row in conn.execute('PRAGMA table_xinfo(fund_scores)')]
+        if 'final_score' not in score_columns:
+            conn.execute('''
+                ALTER TABLE fund_scores ADD COLUMN final_score REAL
+                GENERATED ALWAYS AS ((up_benchmark_average + down_benchmark_average) / 2) VIRTUAL
+            ''')
+        for column in P_VALUE_COLUMNS:
+            if column not in score_columns:
+                conn.execute(f'ALTER TABLE fund_scores ADD COLUMN {column} REAL')
+        for column in SORT_COLUMNS:
+            if column != 'fund_name':  # already covered by the UNIQUE constraint
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_fund_scores_{column} ON fund_scores ({column})')
+
+        _create_search_index(conn)
+        _create_score_distribution(conn)
+        _create_benchmark_scores(conn)
+        _create_peer_ranks(conn)
+
+
+def _create_search_index(conn):
+    # Trigram full-text index over fund and benchmark names, kept in sync by triggers. Trigram matching behaves
+    # like a case-insensitive substring search, which is what the Database page search box always did.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'fund_scores_fts'").fetchone() is not None
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS fund_scores_fts USING fts5(
+                fund_name, benchmark_name, content='fund_scores', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 or older than 3.34, search_scores falls back to LIKE
+        return
+    _fts_ready.add((os.getpid(), DB_PATH))
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS fund_scores_fts_insert AFTER INSERT ON fund_scores BEGIN
+            INSERT INTO fund_scores_fts (rowid, fund_name, benchmark_name)
+            VALUES (new.id, new.fund_name, new.benchmark_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS fund_scores_fts_delete AFTER DELETE ON fund_scores BEGIN
+            INSERT INTO fund_scores_fts (fund_scores_fts, rowid, fund_name, benchmark_name)
+            VALUES ('delete', old.id, old.fund_name, old.benchmark_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS fund_scores_fts_update AFTER UPDATE OF fund_name, benchmark_name ON fund_scores
+        BEGIN
+            INSERT INTO fund_scores_fts (fund_scores_fts, rowid, fund_name, benchmark_name)
+            VALUES ('delete', old.id, old.fund_name, old.benchmark_name);
+            INSERT INTO fund_scores_fts (rowid, fund_name, benchmark_name)
+            VALUES (new.id, new.fund_name, new.benchmark_name);
+        END
+    ''')
+    if not exists:
+        conn.execute("INSERT INTO fund_scores_fts (fund_scores_fts) VALUES ('rebuild')")
+
+
+# Final scores are batting averages in [0, 1]; the quantile sketch counts them in this many equal-width buckets
+SCORE_HISTOGRAM_BINS = 100
+SCORE_BUCKET_SQL = f'MIN(MAX(CAST({{score}} * {SCORE_HISTOGRAM_BINS} AS INTEGER), 0), {SCORE_HISTOGRAM_BINS - 1})'
+
+# Welford updates for adding and removing one final score. Every right-hand side sees the row's old values.
+ADD_DISTRIBUTION_SQL = '''
+            UPDATE score_distribution SET
+                count = count + 1,
+                mean = mean + ({score} - mean) / (count + 1),
+                m2 = m2 + ({score} - mean) * ({score} - (mean + ({score} - mean) / (count + 1)));
+            INSERT INTO score_histogram (bucket, count) VALUES ({bucket}, 1)
+                ON CONFLICT(bucket) DO UPDATE SET count = count + 1;
+'''
+REMOVE_DISTRIBUTION_SQL = '''
+            UPDATE score_distribution SET
+                count = count - 1,
+                mean = CASE WHEN count > 1 THEN (mean * count - {score}) / (count - 1) ELSE 0 END,
+                m2 = CASE WHEN count > 1
+                          THEN MAX(m2 - ({score} - mean) * ({score} - (mean * count - {score}) / (count - 1)), 0)
+                          ELSE 0 END;
+            UPDATE score_histogram SET count = count - 1 WHERE bucket = {bucket};
+'''
+
+
+def _distribution_sql(template, score):
+    return template.format(score=score, bucket=SCORE_BUCKET_SQL.format(score=score))
+
+
+def _create_score_distribution(conn):
+    # Running count, mean and M2 of final_score plus a histogram sketch for quantiles, maintained by triggers in the
+    # same transaction as every write to fund_scores, so the bell curve never has to scan the table
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'score_distribution'").fetchone() is not None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS score_distribution (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            m2 REAL NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            bucket INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS score_distribution_insert AFTER INSERT ON fund_scores
+        WHEN new.final_score IS NOT NULL BEGIN
+{_distribution_sql(ADD_DISTRIBUTION_SQL, 'new.final_score')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS score_distribution_delete AFTER DELETE ON fund_scores
+        WHEN old.final_score IS NOT NULL BEGIN
+{_distribution_sql(REMOVE_DISTRIBUTION_SQL, 'old.final_score')}
+        END
+    ''')
+    # An upsert that changes the score is a remove of the old value and an add of the new one
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS score_distribution_remove_old
+        AFTER UPDATE OF up_benchmark_average, down_benchmark_average ON fund_scores
+        WHEN old.final_score IS NOT NULL BEGIN
+{_distribution_sql(REMOVE_DISTRIBUTION_SQL, 'old.final_score')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS score_distribution_add_new
+        AFTER UPDATE OF up_benchmark_average, down_benchmark_average ON fund_scores
+        WHEN new.final_score IS NOT NULL BEGIN
+{_distribution_sql(ADD_DISTRIBUTION_SQL, 'new.final_score')}
+        END
+    ''')
+    if not exists:
+        # First run against an existing database: seed the statistics with one pass over the scores
+        conn.execute('''
+            INSERT INTO score_distribution (id, count, mean, m2)
+            SELECT 0, COUNT(*), COALESCE(AVG(final_score), 0), 0 FROM fund_scores WHERE final_score IS NOT NULL
+        ''')
+        conn.execute('''
+            UPDATE score_distribution SET m2 = (
+                SELECT COALESCE(SUM((final_score - score_distribution.mean) * (final_score - score_distribution.mean)), 0)
+                FROM fund_scores WHERE final_score IS NOT NULL
+            )
+        ''')
+        conn.execute(f'''
+            INSERT INTO score_histogram (bucket, count)
+            SELECT {SCORE_BUCKET_SQL.format(score='final_score')} AS bucket, COUNT(*) FROM fund_scores
+            WHERE final_score IS NOT NULL GROUP BY bucket
+        ''')
+
+
+# Peer ranks within each benchmark, computed by SQLite window functions. PERCENT_RANK is 0 for the lowest score in
+# the group and 1 for the highest; NTILE quartile 1 is the top quarter. {where} limits the pass to some groups.
+PEER_RANKS_SELECT_SQL = '''
+    INSERT INTO fund_peer_ranks (fund_name, peer_group, peer_count, final_percent_rank, up_percent_rank,
+                                 down_percent_rank, final_quartile)
+    SELECT fund_name, benchmark_name,
+           COUNT(*) OVER peers,
+           PERCENT_RANK() OVER (peers ORDER BY final_score),
+           PERCENT_RANK() OVER (peers ORDER BY up_benchmark_average),
+           PERCENT_RANK() OVER (peers ORDER BY down_benchmark_average),
+           NTILE(4) OVER (peers ORDER BY final_score DESC)
+    FROM fund_scores {where}
+    WINDOW peers AS (PARTITION BY benchmark_name)
+'''
+
+
+def _create_peer_ranks(conn):
+    # Materialized peer ranks. Triggers only note which benchmark groups a write touched, in peer_rank_dirty, and
+    # the write functions below re-rank just those groups before committing, so a bulk upsert ranks each group once.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'fund_peer_ranks'").fetchone() is not None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fund_peer_ranks (
+            fund_name TEXT PRIMARY KEY,
+            peer_group TEXT,
+            peer_count INTEGER NOT NULL,
+            final_percent_rank REAL,
+            up_percent_rank REAL,
+            down_percent_rank REAL,
+            final_quartile INTEGER
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_fund_peer_ranks_group ON fund_peer_ranks (peer_group, final_percent_rank)
+    ''')
+    conn.execute('CREATE TABLE IF NOT EXISTS peer_rank_dirty (benchmark_name TEXT)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS peer_rank_insert AFTER INSERT ON fund_scores BEGIN
+            INSERT INTO peer_rank_dirty (benchmark_name) VALUES (new.benchmark_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS peer_rank_delete AFTER DELETE ON fund_scores BEGIN
+            INSERT INTO peer_rank_dirty (benchmark_name) VALUES (old.benchmark_name);
+        END
+    ''')
+    # Upserts rewrite every column, only mark the groups when a ranked value or the benchmark actually changed
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS peer_rank_update
+        AFTER UPDATE OF benchmark_name, up_benchmark_average, down_benchmark_average ON fund_scores
+        WHEN old.benchmark_name IS NOT new.benchmark_name
+             OR old.up_benchmark_average IS NOT new.up_benchmark_average
+             OR old.down_benchmark_average IS NOT new.down_benchmark_average BEGIN
+            INSERT INTO peer_rank_dirty (benchmark_name) VALUES (old.benchmark_name);
+            INSERT INTO peer_rank_dirty (benchmark_name) VALUES (new.benchmark_name);
+        END
+    ''')
+    if not exists:
+        # First run against an existing database: rank every group in one pass
+        conn.execute(PEER_RANKS_SELECT_SQL.format(where=''))
+    _refresh_peer_ranks(conn.cursor())
+
+
+# Re-rank the benchmark groups the triggers marked. Runs inside the caller's write transaction, so readers never see
+# scores and ranks out of step. Each group is one index range on fund_scores(benchmark_name).
+def _refresh_peer_ranks(cursor):
+    groups = [row[0] for row in cursor.execute(SELECT_DIRTY_PEER_GROUPS_SQL).fetchall()]
+    # Every group is cleared before any is ranked again: a fund that moved between two dirty groups still has its
+    # row in the other group until that group is cleared
+    for group in groups:
+        cursor.execute(DELETE_PEER_GROUP_SQL, (group,))
+    for group in groups:
+        cursor.execute(INSERT_PEER_GROUP_SQL, (group,))
+    if groups:
+        cursor.execute(CLEAR_DIRTY_PEER_GROUPS_SQL)
+
+
+SELECT_DIRTY_PEER_GROUPS_SQL = 'SELECT DISTINCT benchmark_name FROM peer_rank_dirty'
+CLEAR_DIRTY_PEER_GROUPS_SQL = 'DELETE FROM peer_rank_dirty'
+DELETE_PEER_GROUP_SQL = 'DELETE FROM fund_peer_ranks WHERE peer_group IS ?'
+INSERT_PEER_GROUP_SQL = PEER_RANKS_SELECT_SQL.format(where='WHERE benchmark_name IS ?')
+
+
+# Per-benchmark metrics, in data_functions.BENCHMARK_SCORE_METRICS order
+BENCHMARK_SCORE_COLUMNS = ['months', 'general_comparison_average', 'up_benchmark_average', 'down_benchmark_average',
+                           'annualized_return_benchmark', 'excess_return', 'tracking_error', 'information_ratio',
+                           'sharpe_ratio_benchmark']
+
+
+def _create_benchmark_scores(conn):
+    # One row per (fund, benchmark) for funds judged against several benchmarks. fund_scores keeps the primary one.
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS fund_benchmark_scores (
+            fund_name TEXT NOT NULL,
+            benchmark_name TEXT NOT NULL,
+            benchmark_order INTEGER NOT NULL,
+            months INTEGER,
+            {", ".join(f"{column} REAL" for column in BENCHMARK_SCORE_COLUMNS[1:])},
+            final_score REAL GENERATED ALWAYS AS ((up_benchmark_average + down_benchmark_average) / 2) VIRTUAL,
+            PRIMARY KEY (fund_name, benchmark_name)
+        ) WITHOUT ROWID
+    ''')
+    # Every fund compared against one benchmark, best first
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_fund_benchmark_scores_benchmark
+        ON fund_benchmark_scores (benchmark_name, final_score)
+    ''')
+
+
+UPSERT_SCORE_SQL = '''
+    INSERT INTO fund_scores (fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average,
+                             general_p_value, up_p_value, down_p_value)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(fund_name) DO UPDATE SET
+        benchmark_name=excluded.benchmark_name,
+        benchmark_ticker=excluded.benchmark_ticker,
+        general_comparison_average=excluded.general_comparison_average,
+        up_benchmark_average=excluded.up_benchmark_average,
+        down_benchmark_average=excluded.down_benchmark_average,
+        general_p_value=excluded.general_p_value,
+        up_p_value=excluded.up_p_value,
+        down_p_value=excluded.down_p_value
+'''
+FETCH_SCORES_SQL = '''
+    SELECT id, fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average,
+           down_benchmark_average
+    FROM fund_scores
+'''
+FETCH_SCORE_SQL = FETCH_SCORES_SQL + ' WHERE fund_name = ?'
+SEARCH_COLUMN_INDEX = {column: index for index, column in enumerate(
+    ['id', 'fund_name', 'benchmark_name', 'benchmark_ticker', 'general_comparison_average', 'up_benchmark_average',
+     'down_benchmark_average', 'final_score', *P_VALUE_COLUMNS, *PEER_RANK_COLUMNS])}
+SEARCH_SCORES_SQL = '''
+    SELECT id, fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average,
+           down_benchmark_average, final_score, general_p_value, up_p_value, down_p_value,
+           peer_count, final_percent_rank, up_percent_rank, down_percent_rank, final_quartile
+    FROM fund_scores LEFT JOIN fund_peer_ranks USING (fund_name)
+'''
+SELECT_DISTRIBUTION_SQL = 'SELECT count, mean, m2 FROM score_distribution WHERE id = 0'
+SELECT_HISTOGRAM_SQL = 'SELECT bucket, count FROM score_histogram WHERE count > 0'
+SELECT_TOP_SCORES_SQL = '''
+    SELECT fund_name, final_score FROM fund_scores WHERE final_score IS NOT NULL ORDER BY final_score DESC LIMIT ?
+'''
+SELECT_ID_RANGE_SQL = 'SELECT MIN(id), MAX(id) FROM fund_scores'
+SELECT_SCORES_BY_ID_SQL = '''
+    SELECT fund_name, final_score FROM fund_scores
+    WHERE id IN (SELECT value FROM json_each(?)) AND final_score IS NOT NULL
+'''
+DELETE_SCORE_SQL = 'DELETE FROM fund_scores WHERE fund_name = ?'
+DELETE_BENCHMARK_SCORES_SQL = 'DELETE FROM fund_benchmark_scores WHERE fund_name = ?'
+INSERT_BENCHMARK_SCORE_SQL = f'''
+    INSERT INTO fund_benchmark_scores (fund_name, benchmark_name, benchmark_order, {", ".join(BENCHMARK_SCORE_COLUMNS)})
+    VALUES (?, ?, ?, {", ".join("?" for _ in BENCHMARK_SCORE_COLUMNS)})
+'''
+DELETE_RETURNS_SQL = 'DELETE FROM fund_returns WHERE fund_name = ?'
+DELETE_AGGREGATES_SQL = 'DELETE FROM fund_aggregates WHERE fund_name = ?'
+SELECT_AGGREGATES_SQL = f'SELECT {", ".join(AGGREGATE_COLUMNS)} FROM fund_aggregates WHERE fund_name = ?'
+SELECT_STORED_BENCHMARK_SQL = 'SELECT benchmark_name FROM fund_aggregates WHERE fund_name = ?'
+SELECT_RETURN_RANGE_SQL = '''
+    SELECT return_date, fund_return, benchmark_return FROM fund_returns
+    WHERE fund_name = ? AND return_date BETWEEN ? AND ?
+'''
+UPSERT_RETURN_SQL = '''
+    INSERT OR REPLACE INTO fund_returns (fund_name, return_date, fund_return, benchmark_return) VALUES (?, ?, ?, ?)
+'''
+ADD_AGGREGATES_SQL = f'''
+    INSERT INTO fund_aggregates (fund_name, benchmark_name, {", ".join(AGGREGATE_COLUMNS)})
+    VALUES (?, ?, {", ".join("?" for _ in AGGREGATE_COLUMNS)})
+    ON CONFLICT(fund_name) DO UPDATE SET
+        benchmark_name=excluded.benchmark_name,
+        {", ".join(f"{column}={column} + excluded.{column}" for column in AGGREGATE_COLUMNS)}
+'''
+
+
+# UPSERT_SCORE_SQL parameters. Scores stored without their month counts have no p-values.
+def _score_params(fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average,
+                  general_p_value=None, up_p_value=None, down_p_value=None):
+    return (fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average,
+            general_p_value, up_p_value, down_p_value)
 
 # Insert or update a record in the fund_scores table
-def insert_or_update_score(fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO fund_scores (fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(fund_name) DO UPDATE SET
-            benchmark_name=excluded.benchmark_name,
-            benchmark_ticker=excluded.benchmark_ticker,
-            general_comparison_average=excluded.general_comparison_average,
-            up_benchmark_average=excluded.up_benchmark_average,
-            down_benchmark_average=excluded.down_benchmark_average
-    ''', (fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average))
-    conn.commit()
-    conn.close()
+def insert_or_update_score(fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average,
+                           general_p_value=None, up_p_value=None, down_p_value=None):
+    with _transaction() as conn:
+        conn.execute(UPSERT_SCORE_SQL, _score_params(fund_name, benchmark_name, benchmark_ticker, general_comparison_average, up_benchmark_average, down_benchmark_average,
+                                                     general_p_value, up_p_value, down_p_value))
+        _refresh_peer_ranks(conn.cursor())
+
+# Insert or update many records in one transaction. rows are tuples in insert_or_update_score argument order.
+def insert_or_update_scores(rows):
+    with _transaction() as conn:
+        conn.executemany(UPSERT_SCORE_SQL, [_score_params(*row) for row in rows])
+        _refresh_peer_ranks(conn.cursor())
 
 # Fetch all records from the fund_scores table
 def fetch_scores():
     conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM fund_scores')
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return conn.execute(FETCH_SCORES_SQL).fetchall()
+
+# Fetch one fund's record, or None if it is not stored
+def fetch_score(fund_name):
+    conn = connect_db()
+    return conn.execute(FETCH_SCORE_SQL, (fund_name,)).fetchone()
+
+# Count, mean and sample standard deviation of final_score, read from the running statistics in O(1)
+def fetch_score_distribution():
+    conn = connect_db()
+    count, mean, m2 = conn.execute(SELECT_DISTRIBUTION_SQL).fetchone() or (0, 0.0, 0.0)
+    std_dev = (m2 / (count - 1)) ** 0.5 if count > 1 else float('nan')
+    return count, (mean if count else float('nan')), std_dev
+
+# Approximate final_score quantiles from the histogram sketch, interpolating inside a bucket. Accurate to within
+# one bucket width (1 / SCORE_HISTOGRAM_BINS).
+def score_quantiles(probabilities):
+    conn = connect_db()
+    counts = np.zeros(SCORE_HISTOGRAM_BINS)
+    for bucket, count in conn.execute(SELECT_HISTOGRAM_SQL):
+        counts[bucket] = count
+    total = counts.sum()
+    if total == 0:
+        return [float('nan') for _ in probabilities]
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / total
+    edges = np.linspace(0, 1, SCORE_HISTOGRAM_BINS + 1)
+    return [float(np.interp(probability, cumulative, edges)) for probability in probabilities]
+
+# The (fund_name, final_score) points the bell curve draws: the top_n funds by score, which the chart labels, plus a
+# random sample of at most `limit` rows looked up by id. Neither query scans fund_scores.
+def fetch_chart_points(limit=5000, top_n=25, seed=None):
+    conn = connect_db()
+    rows = conn.execute(SELECT_TOP_SCORES_SQL, (top_n,)).fetchall()
+    min_id, max_id = conn.execute(SELECT_ID_RANGE_SQL).fetchone()
+    if min_id is not None:
+        span = max_id - min_id + 1
+        count = fetch_score_distribution()[0]
+        # Deleted funds leave gaps in the ids, so draw enough ids that about `limit` of them still exist
+        draws = min(span, int(np.ceil(limit * span / max(count, 1))))
+        if draws < span:
+            ids = min_id + np.random.default_rng(seed).choice(span, size=draws, replace=False)
+        else:
+            ids = np.arange(min_id, max_id + 1)
+        rows += conn.execute(SELECT_SCORES_BY_ID_SQL, (json.dumps(ids.tolist()),)).fetchall()[:limit]
+    return list(dict.fromkeys(rows))
+
+# One page of fund_scores, filtered and sorted in SQL. `after` is the cursor returned with the previous page, so
+# paging costs the same on page 1 and page 1000. Funds without a value to sort by come last in either direction.
+# Returns (rows, next_cursor); next_cursor is None on the last page.
+def search_scores(search_term='', sort_by='final_score', descending=True, after=None, limit=50):
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort_by}")
+    conn = connect_db()
+    conditions, params = [], []
+
+    search_term = (search_term or '').strip()
+    if search_term:
+        if len(search_term) >= TRIGRAM_MIN_LENGTH and (os.getpid(), DB_PATH) in _fts_ready:
+            conditions.append('id IN (SELECT rowid FROM fund_scores_fts WHERE fund_scores_fts MATCH ?)')
+            params.append('"' + search_term.replace('"', '""') + '"')
+        else:
+            pattern = '%' + search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append("(fund_name LIKE ? ESCAPE '\\' OR benchmark_name LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+
+    # Keyset pagination on (sort column, id), which the sort column's index already orders. Rows whose sort value is
+    # NULL never satisfy the tuple comparison, so they are paged separately, by id, after every non-NULL row.
+    comparison = '<' if descending else '>'
+    direction = 'DESC' if descending else 'ASC'
+    rows = []
+    if after is None or after[0] is not None:
+        page_conditions = conditions + [f'{sort_by} IS NOT NULL']
+        page_params = list(params)
+        if after is not None:
+            page_conditions.append(f'({sort_by}, id) {comparison} (?, ?)')
+            page_params += list(after)
+        rows += _search_page(conn, page_conditions, page_params, f'{sort_by} {direction}, id {direction}', limit + 1)
+    if len(rows) <= limit:
+        page_conditions = conditions + [f'{sort_by} IS NULL']
+        page_params = list(params)
+        if after is not None and after[0] is None:
+            page_conditions.append(f'id {comparison} ?')
+            page_params.append(after[1])
+        rows += _search_page(conn, page_conditions, page_params, f'id {direction}', limit + 1 - len(rows))
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last[SEARCH_COLUMN_INDEX[sort_by]], last[0])
+    return rows, None
+
+
+def _search_page(conn, conditions, params, order, limit):
+    query = SEARCH_SCORES_SQL
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {order} LIMIT ?'
+    return conn.execute(query, params + [limit]).fetchall()
 
 # Remove a record from the fund_scores table
 def remove_score(fund_name):
+    with _transaction() as conn:
+        cursor = conn.execute(DELETE_SCORE_SQL, (fund_name,))
+        if cursor.rowcount == 0:
+            print(f"No record found for fund_name: {fund_name}")
+        conn.execute(DELETE_RETURNS_SQL, (fund_name,))
+        conn.execute(DELETE_AGGREGATES_SQL, (fund_name,))
+        conn.execute(DELETE_BENCHMARK_SCORES_SQL, (fund_name,))
+        _refresh_peer_ranks(conn.cursor())
+
+# Remove many records, and their return histories, in one transaction
+def remove_scores(fund_names):
+    rows = [(fund_name,) for fund_name in fund_names]
+    with _transaction() as conn:
+        conn.executemany(DELETE_SCORE_SQL, rows)
+        conn.executemany(DELETE_RETURNS_SQL, rows)
+        conn.executemany(DELETE_AGGREGATES_SQL, rows)
+        conn.executemany(DELETE_BENCHMARK_SCORES_SQL, rows)
+        _refresh_peer_ranks(conn.cursor())
+
+# Contributions of a set of monthly rows to the running aggregates
+def _aggregate_deltas(fund_returns, benchmark_returns):
+    fund_returns = np.asarray(fund_returns, dtype=np.float64)
+    benchmark_returns = np.asarray(benchmark_returns, dtype=np.float64)
+    excess = fund_returns - benchmark_returns
+    wins = fund_returns > benchmark_returns
+    up = benchmark_returns > 0
+    down = benchmark_returns < 0
+    return np.array([len(fund_returns), wins.sum(), up.sum(), (wins & up).sum(), down.sum(), (wins & down).sum(),
+                     np.log1p(fund_returns).sum(), np.log1p(benchmark_returns).sum(),
+                     fund_returns.sum(), fund_returns @ fund_returns,
+                     benchmark_returns.sum(), benchmark_returns @ benchmark_returns,
+                     excess.sum(), excess @ excess], dtype=np.float64)
+
+
+# Turn a fund_aggregates row (AGGREGATE_COLUMNS order) into the same metrics data_functions computes
+def metrics_from_aggregates(aggregates, periods_per_year=12):
+    totals = dict(zip(AGGREGATE_COLUMNS, aggregates))
+    months = totals['months']
+
+    def ratio(count, total):
+        return count / total if total > 0 else 0
+
+    def annualized_std(sum_values, sum_squares, ddof):
+        if months - ddof <= 0:
+            return float('nan')
+        variance = max(sum_squares - sum_values * sum_values / months, 0.0) / (months - ddof)
+        return np.sqrt(variance) * np.sqrt(periods_per_year)
+
+    metrics = {
+        'months': int(months),
+        'general_comparison_average': ratio(totals['wins'], months),
+        'up_benchmark_average': ratio(totals['up_wins'], totals['up_months']),
+        'down_benchmark_average': ratio(totals['down_wins'], totals['down_months']),
+    }
+    if months > 0:
+        annualized_return_fund = np.expm1(totals['sum_log_fund'] * periods_per_year / months)
+        annualized_return_benchmark = np.expm1(totals['sum_log_benchmark'] * periods_per_year / months)
+        annualized_std_fund = annualized_std(totals['sum_fund'], totals['sum_sq_fund'], 1)
+        tracking_error = annualized_std(totals['sum_excess'], totals['sum_sq_excess'], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics.update({
+                'annualized_return_fund': annualized_return_fund,
+                'annualized_return_benchmark': annualized_return_benchmark,
+                'annualized_std_fund': annualized_std_fund,
+                'annualized_std_benchmark': annualized_std(totals['sum_benchmark'], totals['sum_sq_benchmark'], 1),
+                'tracking_error': tracking_error,
+                'sharpe_ratio_fund': np.float64(annualized_return_fund) / annualized_std_fund,
+                'information_ratio': np.float64(annualized_return_fund - annualized_return_benchmark) / tracking_error,
+            })
+    return metrics
+
+
+def _date_keys(dates):
+    # pandas is only needed once return histories are written, keep it off the app's startup path
+    import pandas as pd
+
+    return list(pd.DatetimeIndex(pd.to_datetime(dates)).strftime('%Y-%m-%d'))
+
+
+# Sort an upload's rows by date, keeping the last row when a date appears more than once
+def _unique_dates(dates, fund_returns, benchmark_returns):
+    unique_dates, last_index = np.unique(np.asarray(dates[::-1]), return_index=True)
+    rows = len(dates) - 1 - last_index
+    return unique_dates.tolist(), fund_returns[rows], benchmark_returns[rows]
+
+
+def _sync_fund_returns(cursor, fund_name, benchmark_name, benchmark_ticker, dates, fund_returns, benchmark_returns):
+    dates = _date_keys(dates)
+    fund_returns = np.asarray(fund_returns, dtype=np.float64)
+    benchmark_returns = np.asarray(benchmark_returns, dtype=np.float64)
+    # A month missing either return cannot be scored, and fund_returns has no room for NULLs
+    complete = ~(np.isnan(fund_returns) | np.isnan(benchmark_returns))
+    if not complete.all():
+        dates = [date for date, is_complete in zip(dates, complete) if is_complete]
+        fund_returns = fund_returns[complete]
+        benchmark_returns = benchmark_returns[complete]
+
+    stored = cursor.execute(SELECT_STORED_BENCHMARK_SQL, (fund_name,)).fetchone()
+    if stored is not None and stored[0] != benchmark_name:
+        # A different benchmark invalidates the stored history, start again from this upload
+        cursor.execute(DELETE_RETURNS_SQL, (fund_name,))
+        cursor.execute(DELETE_AGGREGATES_SQL, (fund_name,))
+        stored = None
+
+    dates, fund_returns, benchmark_returns = _unique_dates(dates, fund_returns, benchmark_returns)
+    if stored is not None and dates:
+        # Months already stored with the same values are already counted. New months and revised ones go through
+        # _append_fund_returns, which takes a revised month's old contribution back out.
+        stored_values = {date: (fund_return, benchmark_return) for date, fund_return, benchmark_return in
+                         cursor.execute(SELECT_RETURN_RANGE_SQL, (fund_name, dates[0], dates[-1]))}
+        changed = np.array([stored_values.get(date) != (fund_return, benchmark_return) for date, fund_return,
+                            benchmark_return in zip(dates, fund_returns.tolist(), benchmark_returns.tolist())],
+                           dtype=bool)
+        dates = [date for date, is_changed in zip(dates, changed) if is_changed]
+        fund_returns = fund_returns[changed]
+        benchmark_returns = benchmark_returns[changed]
+
+    if dates:
+        _append_fund_returns(cursor, fund_name, benchmark_name, dates, fund_returns, benchmark_returns)
+
+    aggregates = cursor.execute(SELECT_AGGREGATES_SQL, (fund_name,)).fetchone()
+    if aggregates is None:
+        return None
+    metrics = metrics_from_aggregates(aggregates)
+    # The win counts are already in the aggregates, and the null distribution is cached per month split
+    totals = dict(zip(AGGREGATE_COLUMNS, aggregates))
+    p_values = batting_p_values(totals['months'], totals['up_months'], totals['down_months'],
+                                totals['wins'], totals['up_wins'], totals['down_wins'])
+    metrics.update(zip(P_VALUE_COLUMNS, p_values))
+    cursor.execute(UPSERT_SCORE_SQL, _score_params(fund_name, benchmark_name, benchmark_ticker,
+                                                   metrics['general_comparison_average'],
+                                                   metrics['up_benchmark_average'],
+                                                   metrics['down_benchmark_average'], *p_values))
+    return metrics
+
+
+# Store rows in fund_returns and fold them into fund_aggregates. Rows for dates that are already stored replace
+# the old values, and the old contribution is taken back out first, so the cost is O(rows given).
+def _append_fund_returns(cursor, fund_name, benchmark_name, dates, fund_returns, benchmark_returns):
+    new_values = dict(zip(dates, zip(fund_returns, benchmark_returns)))
+    replaced = [(fund_return, benchmark_return) for date, fund_return, benchmark_return in cursor.execute(
+        SELECT_RETURN_RANGE_SQL, (fund_name, min(dates), max(dates))) if date in new_values]
+
+    deltas = _aggregate_deltas(fund_returns, benchmark_returns)
+    if replaced:
+        old_fund, old_benchmark = zip(*replaced)
+        deltas -= _aggregate_deltas(old_fund, old_benchmark)
+
+    cursor.executemany(UPSERT_RETURN_SQL, [(fund_name, date, float(fund_return), float(benchmark_return))
+                                           for date, (fund_return, benchmark_return) in new_values.items()])
+    cursor.execute(ADD_AGGREGATES_SQL, (fund_name, benchmark_name, *[float(delta) for delta in deltas]))
+
+
+# Store a fund's monthly returns and rescore it from the running aggregates. Only new or revised months are written,
+# so a monthly refresh writes O(new months) rows rather than O(history). benchmark_rows, when given, replace the fund's
+# per-benchmark scores in the same transaction.
+def sync_fund_returns(fund_name, benchmark_name, benchmark_ticker, dates, fund_returns, benchmark_returns,
+                      benchmark_rows=None):
+    with _transaction() as conn:
+        cursor = conn.cursor()
+        metrics = _sync_fund_returns(cursor, fund_name, benchmark_name, benchmark_ticker, dates, fund_returns,
+                                     benchmark_returns)
+        if benchmark_rows is not None:
+            _store_benchmark_scores(cursor, fund_name, benchmark_rows)
+        _refresh_peer_ranks(cursor)
+        return metrics
+
+
+# sync_fund_returns for many funds in one transaction. Each item is a tuple in sync_fund_returns argument order.
+# benchmark_items, (fund_name, rows) tuples with rows as in _store_benchmark_scores, are stored in the same
+# transaction, so a failure leaves neither the scores nor the per-benchmark scores half written.
+def sync_fund_returns_many(items, benchmark_items=()):
+    with _transaction() as conn:
+        cursor = conn.cursor()
+        results = [_sync_fund_returns(cursor, *item) for item in items]
+        for fund_name, rows in benchmark_items:
+            _store_benchmark_scores(cursor, fund_name, rows)
+        _refresh_peer_ranks(cursor)
+        return results
+
+
+# Replace a fund's per-benchmark scores. rows are (benchmark name, *BENCHMARK_SCORE_COLUMNS) tuples, primary
+# benchmark first, as data_functions.benchmark_score_rows returns them.
+def _store_benchmark_scores(cursor, fund_name, rows):
+    # The upload is the whole truth for a fund's benchmark set, so benchmarks it no longer has are dropped
+    cursor.execute(DELETE_BENCHMARK_SCORES_SQL, (fund_name,))
+    cursor.executemany(INSERT_BENCHMARK_SCORE_SQL, [(fund_name, row[0], order, *row[1:])
+                                                    for order, row in enumerate(rows)])
+
+
+# Metrics for one fund straight from its running aggregates, without touching its return history
+def fetch_fund_metrics(fund_name):
     conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM fund_scores WHERE fund_name = ?', (fund_name,))
-    if cursor.rowcount == 0:
-        print(f"No record found for fund_name: {fund_name}")
-    conn.commit()
-    conn.close()
-
-# Backup the database
-def backup_database():
-    if not os.path.exists('backups'):
-        os.makedirs('backups')
-    
+    aggregates = conn.execute(SELECT_AGGREGATES_SQL, (fund_name,)).fetchone()
+    return metrics_from_aggregates(aggregates) if aggregates is not None else None
+
+BACKUP_DIR = 'backups'
+MAX_BACKUPS = 5
+# Files SQLite keeps next to a WAL-mode database while it is open
+BACKUP_SIDECAR_SUFFIXES = ('-wal', '-shm')
+# Pages copied per backup step. Between steps other connections can read and write the live database.
+BACKUP_PAGES_PER_STEP = 256
+
+
+# A backup running on a background thread. progress goes from 0 to 1, done is set when it finishes either way.
+class BackupJob:
+    def __init__(self):
+        self.progress = 0.0
+        self.filename = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def _prune_backups():
     # Get the list of existing backups
-    backups = sorted([f for f in os.listdir('backups') if f.startswith('funds_scores_backup_')])
-    
-    # Remove the oldest backup if there are already 5 backups
-    if len(backups) >= 5:
-        os.remove(os.path.join('backups', backups[0]))
-    
-    # Create a new backup with a timestamp
+    entries = os.listdir(BACKUP_DIR)
+    backups = sorted([f for f in entries if f.startswith('funds_scores_backup_') and f.endswith('.db')])
+
+    # Remove the oldest backups so there are at most MAX_BACKUPS
+    for backup in backups[:max(len(backups) - MAX_BACKUPS, 0)]:
+        os.remove(os.path.join(BACKUP_DIR, backup))
+
+    # Backups taken before they were switched out of WAL mode leave -wal and -shm files once opened. Drop every one
+    # whose backup is gone, including those of backups pruned before this cleanup existed.
+    kept = set(backups[max(len(backups) - MAX_BACKUPS, 0):])
+    for entry in entries:
+        if entry.startswith('funds_scores_backup_') and entry.endswith(BACKUP_SIDECAR_SUFFIXES) \
+                and entry.rsplit('-', 1)[0] not in kept:
+            os.remove(os.path.join(BACKUP_DIR, entry))
+
+
+# Backup the database with the SQLite online backup API, page by page, so it is a consistent snapshot even
+# while other sessions write. progress_callback(fraction) is called after every step.
+def backup_database(progress_callback=None):
+    if not os.path.exists(BACKUP_DIR):
+        os.makedirs(BACKUP_DIR)
+
+    # Create a new backup with a timestamp, written under a temporary name so a half-copied file is never listed
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     backup_filename = f'funds_scores_backup_{timestamp}.db'
-    shutil.copy('funds_scores.db', os.path.join('backups', backup_filename))
+    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+    temp_path = os.path.join(BACKUP_DIR, f'partial_{backup_filename}')
+
+    def report(status, remaining, total):
+        if progress_callback is not None and total:
+            progress_callback((total - remaining) / total)
+
+    try:
+        destination = sqlite3.connect(temp_path)
+        try:
+            connect_db().backup(destination, pages=BACKUP_PAGES_PER_STEP, progress=report)
+            # The copy inherits the live database's WAL mode, which would leave -wal and -shm files next to the
+            # backup whenever it is opened. A backup is a single self-contained file.
+            destination.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            destination.close()
+        os.replace(temp_path, backup_path)
+    finally:
+        # Only left behind when the copy failed
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    # Older backups are only dropped once the new one is in place
+    _prune_backups()
+    if progress_callback is not None:
+        progress_callback(1.0)
     print(f"Backup created: {backup_filename}")
+    return backup_filename
+
+
+# Run backup_database on a background thread. on_complete runs on that thread after a successful backup, e.g. the
+# deletion the backup protects.
+def start_backup(on_complete=None):
+    job = BackupJob()
+
+    def run():
+        try:
+            job.filename = backup_database(lambda fraction: setattr(job, 'progress', fraction))
+            if on_complete is not None:
+                on_complete()
+        except Exception as e:
+            job.error = e
+        finally:
+            job.done.set()
 
-# Restore the database from a selected backup
+    threading.Thread(target=run, name='funds-db-backup', daemon=True).start()
+    return job
+
+
+# Restore the database from a selected backup. The backup is checked with PRAGMA integrity_check first and then
+# copied into the live database in a single backup step, which SQLite applies as one write transaction: other
+# connections see either the old or the restored database, never a mix, and nothing is copied over open files.
 def restore_database(backup_filename):
-    if os.path.exists(os.path.join('backups', backup_filename)):
-        shutil.copy(os.path.join('backups', backup_filename), 'funds_scores.db')
-        print(f"Database restored from {backup_filename}")
-    else:
+    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+    if not os.path.exists(backup_path):
         print(f"Backup file {backup_filename} does not exist")
+        return False
+
+    # immutable: backups written in WAL mode by older versions are read without creating -wal or -shm files
+    source = sqlite3.connect(f'file:{backup_path}?mode=ro&immutable=1', uri=True)
+    try:
+        try:
+            result = source.execute('PRAGMA integrity_check').fetchall()
+        except sqlite3.DatabaseError as e:
+            result = [(str(e),)]
+        if result != [('ok',)]:
+            print(f"Backup file {backup_filename} failed the integrity check: {result[:5]}")
+            return False
+        conn = connect_db()
+        with _write_lock:
+            source.backup(conn)
+    finally:
+        source.close()
+
+    # The backup may predate newer tables or indexes, so let connect_db bring the schema up to date again
+    _schema_ready.discard((os.getpid(), DB_PATH))
+    _fts_ready.discard((os.getpid(), DB_PATH))
+    print(f"Database restored from {backup_filename}")
+    return True
@@ -1,283 +1,406 @@
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Border, Side, PatternFill, Font, Alignment
+from io import BytesIO
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, Side, PatternFill, Font, Alignment, NamedStyle
 from openpyxl.utils import get_column_letter
+from perf import timed
+from data_functions import comparison_table
+
+# Shared styles, created once and reused for every cell
+TITLE_FONT = Font(color='FFFFFFFF', bold=True, size=16)  # White, bold, and large
+TITLE_FILL = PatternFill(start_color='FF10045A', end_color='FF10045A', fill_type='solid')  # Dark background
+CENTER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+HEADER_FILL = PatternFill(start_color='FF443793', end_color='FF443793', fill_type='solid')  # ARGB format
+HEADER_FONT = Font(color='FFFFFFFF')  # ARGB format
+BOLD_HEADER_FONT = Font(color='FFFFFFFF', bold=True)  # ARGB format, bold header font
+DATA_FONT = Font(color='ff10045a')  # ARGB format
+BLACK_FILL = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')  # ARGB format
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'),
+                     bottom=Side(style='thin'))
+DATE_FORMAT = 'yyyy-mm-dd'
+
+BATTING_TITLES = ['All Time Batting', 'Positive Benchmark', 'Negative Benchmark']
+BATTING_COLUMNS = ['Date', 'Fund Return', 'Benchmark Return', 'Excess', 'Is Greater', 'Batting']
+BATTING_SOURCE_COLUMNS = ['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']
+# Rows the black column between the batting tables covers: title, header and the first two data rows
+SEPARATOR_ROWS = 4
+EXCESS_COLUMNS = ['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']
+
+# Above this many rows the app switches to the constant-memory streaming writer
+STREAMING_ROW_THRESHOLD = 5000
+
+# Streaming widths are fixed up front because write-only sheets cannot be resized after rows are written
+STREAM_DATE_WIDTH = 12
+STREAM_NUMBER_WIDTH = 22
 
 
 def add_batting_column(df, batting_value):
-    df['batting'] = ''
-    if not df.empty:
-        df.at[0, 'batting'] = batting_value
-    return df
-
-
-def write_dataframes_to_excel(df1, df2_positive, df3_negative, df1_batting, df2_batting, df3_batting, fund_name,benchmark_name,
-                              file_path, excess_return_data, final_scores):
+    batting = [''] * len(df)
+    if batting:
+        batting[0] = batting_value
+    return df.assign(batting=pd.Series(batting, index=df.index, dtype=object))
+
+
+# Bootstrap interval rows in the results sheet, keyed by the bootstrap.bootstrap_intervals metric names
+INTERVAL_METRIC_ROWS = {
+    "Sharpe Ratio (Fund)": 'sharpe_ratio_fund',
+    "Information Ratio": 'information_ratio',
+    "Up Batting Average": 'up_average',
+    "Down Batting Average": 'down_average',
+    "All Time Batting Average": 'general_average',
+}
+
+
+# Metric/Value table for the results sheet, from a data_functions.FundMetrics. With bootstrap intervals the table
+# gets CI Low / CI High columns, blank for metrics without an interval.
+def final_scores_table(metrics, intervals=None):
+    full_average = round(((metrics.up_average + metrics.down_average) / 2) * 100)
+    final_scores = pd.DataFrame({
+        "Metric": ["Annualized Return (Fund)", "Annualized Return (Benchmark)",
+                   "Annualized STD (Fund)", "Annualized STD (Benchmark)",
+                   "Excess Return", "Tracking Error", "Sharpe Ratio (Fund)",
+                   "Sharpe Ratio (Benchmark)", "Information Ratio", "Up Batting Average", "Down Batting Average",
+                   "All Time Batting Average", "Final Batting Average"],
+        "Value": [metrics.annualized_return_fund, metrics.annualized_return_benchmark, metrics.annualized_std_fund,
+                  metrics.annualized_std_benchmark, metrics.excess_return, metrics.tracking_error,
+                  metrics.sharpe_ratio_fund, metrics.sharpe_ratio_benchmark, metrics.information_ratio,
+                  metrics.up_average, metrics.down_average, metrics.general_average, full_average]
+    })
+    if intervals is not None:
+        no_interval = (np.nan, np.nan)
+        bounds = [intervals.get(INTERVAL_METRIC_ROWS.get(metric), no_interval) for metric in final_scores["Metric"]]
+        final_scores["CI Low"] = [low for low, _ in bounds]
+        final_scores["CI High"] = [high for _, high in bounds]
+    return final_scores
+
+
+# The Test Fund results workbook for one fund, as a BytesIO. fund_data_df needs the Excess Return column and
+# intervals are optional bootstrap confidence intervals for the results sheet.
+# Long histories go through the streaming writer so memory stays flat.
+@timed()
+def fund_results_workbook(fund_data_df, metrics, fund_name, benchmark_name, rolling_data=None, intervals=None):
+    final_scores = final_scores_table(metrics, intervals)
+    if len(fund_data_df) > STREAMING_ROW_THRESHOLD:
+        return stream_dataframes_to_excel(fund_data_df, metrics.general_average, metrics.up_average,
+                                          metrics.down_average, fund_name, benchmark_name, final_scores,
+                                          rolling_data=rolling_data)
+    return write_dataframes_to_excel(comparison_table(fund_data_df, metrics),
+                                     comparison_table(fund_data_df, metrics, metrics.up),
+                                     comparison_table(fund_data_df, metrics, metrics.down),
+                                     metrics.general_average, metrics.up_average, metrics.down_average,
+                                     fund_name, benchmark_name,
+                                     fund_data_df[['Date', 'Fund Return', 'Benchmark Return', 'Excess Return']],
+                                     final_scores, rolling_data=rolling_data)
+
+
+@timed()
+def write_dataframes_to_excel(df1, df2_positive, df3_negative, df1_batting, df2_batting, df3_batting, fund_name,
+                              benchmark_name, excess_return_data, final_scores, rolling_data=None):
+    # Build the whole styled workbook in memory and serialize it exactly once
     df1 = add_batting_column(df1, df1_batting)
     df2_positive = add_batting_column(df2_positive, df2_batting)
     df3_negative = add_batting_column(df3_negative, df3_batting)
 
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        final_scores.to_excel(writer, sheet_name=f'{fund_name}_results', index=False)
-
-        # Write individual DataFrames to separate sections of the sheet template
-        df1.to_excel(writer, sheet_name='batting_average', startrow=0, startcol=0, index=False)
-        df2_positive.to_excel(writer, sheet_name='batting_average', startrow=0, startcol=df1.shape[1] + 1, index=False)
-        df3_negative.to_excel(writer, sheet_name='batting_average', startrow=0,
-                              startcol=df1.shape[1] + df2_positive.shape[1] + 2, index=False)
-
-        excess_return_data.to_excel(writer, sheet_name='excess', index=False)
-
-    # Add title to the "results" sheet
-    add_title_to_results(file_path, fund_name, benchmark_name)
-
-    resize_columns(file_path, fund_name + '_results')
-    resize_columns(file_path, 'batting_average')
-    resize_columns(file_path, 'excess')
-    add_borders_to_tables(file_path, fund_name + '_results', final_scores)
-    add_borders_to_batting(file_path, 'batting_average', [df1, df2_positive, df3_negative])
-    format_date_columns(file_path, 'batting_average')
-    format_date_columns(file_path, 'excess')
-    add_titles_to_batting(file_path, 'batting_average',
-                          ['All Time Batting', 'Positive Benchmark', 'Negative Benchmark'],
-                          [df1, df2_positive, df3_negative])
-    insert_row_and_label_columns(file_path, 'batting_average',
-                                 ['Date', 'Fund Return', 'Benchmark Return', 'Excess', 'Is Greater', 'Batting'])
-    format_excess_table(file_path, 'excess')
-    add_title_to_excess(file_path, 'excess', 'Excess Return Table')
-
-def add_title_to_results(file_path, fund_name, benchmark_name):
-    wb = load_workbook(file_path)
-    ws = wb[f'{fund_name}_results']
-
-    # Define the title formatting
-    font = Font(color='FFFFFFFF', bold=True, size=16)  # White, bold, and large
-    fill = PatternFill(start_color='FF10045A', end_color='FF10045A', fill_type='solid')  # Dark background
-    alignment = Alignment(horizontal='center', vertical='center')
-
-    # Merge cells to create a wide enough area for the title
-    last_column = ws.max_column  # Get the last column of data
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=last_column)
-
-    # Add the title text
-    title_cell = ws.cell(row=1, column=1)
-    title_cell.value = f"{fund_name} vs {benchmark_name} results"
-    title_cell.font = font
-    title_cell.fill = fill
-    title_cell.alignment = alignment
-
-    # Optional: Adjust row height to make the title stand out more
-    ws.row_dimensions[1].height = 30  # Adjust as needed
-
-    wb.save(file_path)
-
-def add_borders_to_tables(file_path, sheet_name, final_scores):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
-
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'),
-                    bottom=Side(style='thin'))
-
-    num_rows_final_scores, num_cols_final_scores = final_scores.shape
-
-    for row in ws.iter_rows(min_row=1, max_row=num_rows_final_scores + 1, min_col=1, max_col=num_cols_final_scores):
-        for cell in row:
-            cell.border = border
-
-    wb.save(file_path)
-
-
-def add_borders_to_batting(file_path, sheet_name, dfs):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
-
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'),
-                    bottom=Side(style='thin'))
-
-    start_col = 1
-    for df in dfs:
-        num_rows, num_cols = df.shape
-        for row in ws.iter_rows(min_row=4, max_row=num_rows + 4, min_col=start_col, max_col=start_col + num_cols - 1):
-            for cell in row:
-                cell.border = border
-        start_col += num_cols + 2  # Ensure there's a full-width empty column between tables
-
-    wb.save(file_path)
-
+    wb = Workbook()
+    results_ws = wb.active
+    results_ws.title = f'{fund_name}_results'
+    add_results_sheet(results_ws, final_scores, f"{fund_name} vs {benchmark_name} results")
 
-def resize_columns(file_path, sheet_name):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
+    batting_ws = wb.create_sheet('batting_average')
+    add_batting_sheet(batting_ws, [df1, df2_positive, df3_negative], BATTING_TITLES, BATTING_COLUMNS)
 
-    # Get all merged cell ranges in the worksheet
-    merged_ranges = ws.merged_cells.ranges
+    excess_ws = wb.create_sheet('excess')
+    add_excess_sheet(excess_ws, excess_return_data, 'Excess Return Table')
 
-    # Loop through all columns
-    for col in ws.columns:
-        if col:  # Check if the column is not empty
-            skip_column = False
+    if rolling_data is not None and not rolling_data.empty:
+        rolling_ws = wb.create_sheet('rolling')
+        add_table_sheet(rolling_ws, rolling_data, 'Rolling Performance')
 
-            # Check if this column is part of any merged range
-            for merged_range in merged_ranges:
-                # If the column is part of the merged range, skip it
-                if col[0].row >= merged_range.min_row and col[0].row <= merged_range.max_row:
-                    if col[0].column >= merged_range.min_col and col[0].column <= merged_range.max_col:
-                        skip_column = True
-                        break
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
 
-            if not skip_column:  # Only proceed if the column is not part of a merged range
-                max_length = 0
-                column = col[0].column_letter  # Get the column letter of the first cell in the column
-                for cell in col:
-                    try:
-                        if isinstance(cell.value, (str, int, float)):
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        if cell.is_date:
-                            max_length = max(max_length, 10)  # Date format length
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)  # Adjusting width with some padding
-                ws.column_dimensions[column].width = adjusted_width
 
-    wb.save(file_path)
+def cell_value(value):
+    # openpyxl cannot store NaN/NaT, leave those cells empty like pandas does
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.datetime64):
+        return pd.Timestamp(value).to_pydatetime()
+    return value
 
 
+def value_width(value):
+    if value is None:
+        return 0
+    if hasattr(value, 'strftime'):
+        return 10  # Date format length
+    if isinstance(value, (str, int, float)):
+        return len(str(value))
+    return 0
 
 
-def format_date_columns(file_path, sheet_name):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
+def add_title(ws, title, start_col, end_col, row=1):
+    # Merge cells to create a wide enough area for the title
+    if end_col > start_col:
+        ws.merge_cells(start_row=row, start_column=start_col, end_row=row, end_column=end_col)
+    title_cell = ws.cell(row=row, column=start_col, value=title)
+    title_cell.font = TITLE_FONT
+    title_cell.fill = TITLE_FILL
+    title_cell.alignment = CENTER_ALIGNMENT
+
+
+def write_table(ws, df, start_row, start_col, headers, widths, header_font=HEADER_FONT, data_font=None,
+                header_alignment=None, border_data=True):
+    # Write header and rows while styling, tracking the widest value seen in each column
+    for offset, header in enumerate(headers):
+        cell = ws.cell(row=start_row, column=start_col + offset, value=header)
+        cell.fill = HEADER_FILL
+        cell.font = header_font
+        cell.border = THIN_BORDER
+        if header_alignment is not None:
+            cell.alignment = header_alignment
+        widths[start_col + offset] = max(widths.get(start_col + offset, 0), value_width(header))
+
+    for row_num, row in enumerate(df.itertuples(index=False, name=None), start=start_row + 1):
+        for offset, value in enumerate(row):
+            value = cell_value(value)
+            cell = ws.cell(row=row_num, column=start_col + offset, value=value)
+            if border_data:
+                cell.border = THIN_BORDER
+            if data_font is not None:
+                cell.font = data_font
+            if hasattr(value, 'strftime'):
+                cell.number_format = DATE_FORMAT
+            width = value_width(value)
+            if width > widths.get(start_col + offset, 0):
+                widths[start_col + offset] = width
 
-    for col in ws.columns:
-        for cell in col:
-            if cell.is_date:
-                cell.number_format = 'yyyy-mm-dd'
 
-    wb.save(file_path)
+def resize_columns(ws, widths):
+    for column, max_length in widths.items():
+        ws.column_dimensions[get_column_letter(column)].width = max_length + 2  # Adjusting width with some padding
 
 
-def add_titles_to_batting(file_path, sheet_name, titles, dfs):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
+@timed()
+def add_results_sheet(ws, final_scores, title):
+    widths = {}
+    add_title(ws, title, 1, max(final_scores.shape[1], 1))
+    ws.row_dimensions[1].height = 30
+    write_table(ws, final_scores, 2, 1, list(final_scores.columns), widths, header_font=BOLD_HEADER_FONT)
+    resize_columns(ws, widths)
 
-    font = Font(color='FFFFFFFF', bold=True, size=16)  # ARGB format
-    fill = PatternFill(start_color='FF10045A', end_color='FF10045A', fill_type='solid')  # ARGB format
-    alignment = Alignment(horizontal='center', vertical='center')
-    black_fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')  # ARGB format
 
+@timed()
+def add_batting_sheet(ws, dfs, titles, columns):
+    widths = {}
     start_col = 1
     for title, df in zip(titles, dfs):
         num_cols = df.shape[1]
-        ws.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=start_col + num_cols - 1)
-        cell = ws.cell(row=1, column=start_col)
-        cell.value = title
-        cell.font = font
-        cell.fill = fill
-        cell.alignment = alignment
-
-        start_col += num_cols + 1
-        ws.column_dimensions[get_column_letter(start_col - 1)].width = 1
-        ws.merge_cells(start_row=1, start_column=start_col - 1, end_row=4, end_column=start_col - 1)
-        for row in range(1, 5):  # Fill all four rows of the black column
-            cell = ws.cell(row=row, column=start_col - 1)
-            cell.fill = black_fill
-
-    wb.save(file_path)
-
-
-def insert_row_and_label_columns(file_path, sheet_name, columns):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
-
-    ws.insert_rows(2)  # Insert a row for the headers
-
-    header_fill = PatternFill(start_color='FF443793', end_color='FF443793', fill_type='solid')  # ARGB format
-    header_font = Font(color='FFFFFFFF')  # ARGB format
-    data_font = Font(color='ff10045a')  # ARGB format
-
-    start_col = 1
-    for col_group in range(3):  # Assuming three tables
-        for col_num, column in enumerate(columns, start=start_col):
-            cell = ws.cell(row=2, column=col_num)
-            cell.value = column
-            cell.fill = header_fill
-            cell.font = header_font
-        for row in ws.iter_rows(min_row=3, max_row=ws.max_row, min_col=start_col, max_col=start_col + len(columns) - 1):
-            for cell in row:
-                cell.font = data_font
-        start_col += len(columns) + 1  # Adjust the starting column for the next table
-
-    wb.save(file_path)
-
-
-def format_excess_table(file_path, sheet_name):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
-
-    # Define header style to match the batting_average format
-    header_fill = PatternFill(start_color='FF443793', end_color='FF443793', fill_type='solid')  # ARGB format
-    header_font = Font(color='FFFFFFFF', bold=True)  # ARGB format, bold header font
-    header_alignment = Alignment(horizontal='center', vertical='center')
-
-    # Define border style
+        headers = columns[:num_cols] + [str(col) for col in df.columns[len(columns):]]
+        add_title(ws, title, start_col, start_col + num_cols - 1)
+        write_table(ws, df, 2, start_col, headers, widths, data_font=DATA_FONT)
+
+        # Black separator over the first four rows after each table, as the original export drew it
+        separator_col = start_col + num_cols
+        ws.merge_cells(start_row=1, start_column=separator_col, end_row=SEPARATOR_ROWS, end_column=separator_col)
+        for row in range(1, SEPARATOR_ROWS + 1):
+            ws.cell(row=row, column=separator_col).fill = BLACK_FILL
+        ws.column_dimensions[get_column_letter(separator_col)].width = 1
+
+        start_col = separator_col + 1
+    resize_columns(ws, widths)
+
+
+@timed()
+def add_excess_sheet(ws, excess_return_data, title):
+    add_table_sheet(ws, excess_return_data, title)
+
+
+@timed()
+def add_table_sheet(ws, df, title):
+    # Single titled table with the bold header style, used by the excess and rolling sheets
+    widths = {}
+    add_title(ws, title, 1, max(df.shape[1], 1))
+    ws.row_dimensions[1].height = 30
+    write_table(ws, df, 2, 1, [str(col) for col in df.columns], widths,
+                header_font=BOLD_HEADER_FONT, header_alignment=CENTER_ALIGNMENT, border_data=False)
+    resize_columns(ws, widths)
+
+
+@timed()
+def stream_dataframes_to_excel(fund_data_df, general_average, up_average, down_average, fund_name, benchmark_name,
+                               final_scores, output=None, rolling_data=None):
+    # Write-only variant of write_dataframes_to_excel: rows are generated and flushed one at a time
+    output = BytesIO() if output is None else output
+    wb = create_streaming_workbook()
+    stream_fund_sheets(wb, fund_name, benchmark_name, fund_data_df, general_average, up_average, down_average,
+                       final_scores, rolling_data=rolling_data)
+    wb.save(output)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+@timed()
+def stream_funds_to_excel(funds, output=None):
+    # Multi-fund book. funds is an iterable of dicts with the stream_fund_sheets keyword arguments,
+    # so a generator can load one fund at a time
+    output = BytesIO() if output is None else output
+    wb = create_streaming_workbook()
+    for fund in funds:
+        stream_fund_sheets(wb, sheet_prefix=f"{fund['fund_name']}_", **fund)
+    wb.save(output)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+def create_streaming_workbook():
+    wb = Workbook(write_only=True)
     border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'),
                     bottom=Side(style='thin'))
-
-    # Format the header row (row 2) - Assuming headers are in row 2
-    for col_num, cell in enumerate(ws[2], start=1):
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = border
-
-    # Resize columns based on content (same as before)
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter  # Get the column name
-        for cell in col:
-            try:
-                if isinstance(cell.value, (str, int, float)):
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                if cell.is_date:
-                    max_length = max(max_length, 10)  # Date format length
-            except:
-                pass
-        adjusted_width = (max_length + 2)  # Adjusting width with some padding
-        ws.column_dimensions[column].width = adjusted_width
-
-    wb.save(file_path)
-
-
-def add_title_to_excess(file_path, sheet_name, title):
-    wb = load_workbook(file_path)
-    ws = wb[sheet_name]
-
-    # Define the title cell formatting (same as batting average titles)
-    font = Font(color='FFFFFFFF', bold=True, size=16)  # ARGB format for white and bold text
-    fill = PatternFill(start_color='FF10045A', end_color='FF10045A', fill_type='solid')  # ARGB format for fill color
-    alignment = Alignment(horizontal='center', vertical='center')
-
-    # Shift the entire table down by one row (starting from row 2 onwards)
-    for row in range(ws.max_row, 0, -1):  # Start from the last row and go upwards
-        for col in range(1, ws.max_column + 1):
-            ws.cell(row=row + 1, column=col).value = ws.cell(row=row, column=col).value
-
-    # Merge cells in row 1 for the title
-    last_column = ws.max_column  # Get the last column with data
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=last_column)
-
-    # Set the title text, font, fill, and alignment
-    title_cell = ws.cell(row=1, column=1)
-    title_cell.value = title
-    title_cell.font = font
-    title_cell.fill = fill
-    title_cell.alignment = alignment
-
-    # Optional: Set the row height for the title to make it stand out more
-    ws.row_dimensions[1].height = 30  # Adjust this height to make the title more prominent
-
-    wb.save(file_path)
-
-    wb.save(file_path)
+    named_styles = [
+        NamedStyle('ba_title', font=TITLE_FONT, fill=TITLE_FILL, alignment=CENTER_ALIGNMENT),
+        NamedStyle('ba_header', font=HEADER_FONT, fill=HEADER_FILL, border=border),
+        NamedStyle('ba_bold_header', font=BOLD_HEADER_FONT, fill=HEADER_FILL, border=border,
+                   alignment=CENTER_ALIGNMENT),
+        NamedStyle('ba_cell', border=border),
+        NamedStyle('ba_date_cell', border=border, number_format=DATE_FORMAT),
+        NamedStyle('ba_data', font=DATA_FONT, border=border),
+        NamedStyle('ba_date_data', font=DATA_FONT, border=border, number_format=DATE_FORMAT),
+        NamedStyle('ba_plain_date', number_format=DATE_FORMAT),
+        NamedStyle('ba_separator', fill=BLACK_FILL),
+    ]
+    for style in named_styles:
+        wb.add_named_style(style)
+    return wb
+
+
+def styled_cell(ws, value, style):
+    cell = WriteOnlyCell(ws, value=cell_value(value))
+    if style is not None:
+        cell.style = style
+    return cell
+
+
+def data_cell(ws, value, style, date_style):
+    value = cell_value(value)
+    return styled_cell(ws, value, date_style if hasattr(value, 'strftime') else style)
+
+
+def stream_sheet_name(sheet_prefix, name):
+    return f'{sheet_prefix}{name}'[:31]
+
+
+def stream_fund_sheets(wb, fund_name, benchmark_name, fund_data_df, general_average, up_average, down_average,
+                       final_scores, sheet_prefix='', rolling_data=None):
+    # Every sheet carries the prefix. Without one the results sheet keeps the in-memory export's name.
+    results_ws = wb.create_sheet(stream_sheet_name(sheet_prefix, 'results') if sheet_prefix else
+                                 stream_sheet_name(fund_name, '_results'))
+    stream_results_sheet(results_ws, final_scores, f"{fund_name} vs {benchmark_name} results")
+
+    batting_ws = wb.create_sheet(stream_sheet_name(sheet_prefix, 'batting_average'))
+    stream_batting_sheet(batting_ws, fund_data_df, [general_average, up_average, down_average])
+
+    excess_ws = wb.create_sheet(stream_sheet_name(sheet_prefix, 'excess'))
+    stream_excess_sheet(excess_ws, fund_data_df, 'Excess Return Table')
+
+    if rolling_data is not None and not rolling_data.empty:
+        rolling_ws = wb.create_sheet(stream_sheet_name(sheet_prefix, 'rolling'))
+        stream_table_sheet(rolling_ws, rolling_data, 'Rolling Performance')
+
+
+def stream_title_row(ws, title, num_cols):
+    ws.row_dimensions[1].height = 30
+    if num_cols > 1:
+        ws.merged_cells.add(f'A1:{get_column_letter(num_cols)}1')
+    ws.append([styled_cell(ws, title, 'ba_title')])
+
+
+@timed()
+def stream_results_sheet(ws, final_scores, title):
+    num_cols = max(final_scores.shape[1], 1)
+    for column in range(1, num_cols + 1):
+        ws.column_dimensions[get_column_letter(column)].width = STREAM_NUMBER_WIDTH + 10
+    stream_title_row(ws, title, num_cols)
+    ws.append([styled_cell(ws, header, 'ba_bold_header') for header in final_scores.columns])
+    for row in final_scores.itertuples(index=False, name=None):
+        ws.append([data_cell(ws, value, 'ba_cell', 'ba_date_cell') for value in row])
+
+
+@timed()
+def stream_batting_sheet(ws, fund_data_df, averages):
+    # The up and down tables are index views into the single fund frame, never materialized copies
+    fund_returns = fund_data_df['Fund Return'].to_numpy(dtype=np.float64)
+    benchmark_returns = fund_data_df['Benchmark Return'].to_numpy(dtype=np.float64)
+    check = (fund_returns > benchmark_returns).astype(np.int64)
+    row_sets = [np.arange(len(fund_data_df)), np.flatnonzero(benchmark_returns > 0),
+                np.flatnonzero(benchmark_returns < 0)]
+    columns = [fund_data_df[name].to_numpy() if name in fund_data_df.columns else
+               fund_returns - benchmark_returns for name in BATTING_SOURCE_COLUMNS]
+
+    num_cols = len(BATTING_COLUMNS)
+    title_row, header_row = [], []
+    for block, title in enumerate(BATTING_TITLES):
+        start_col = block * (num_cols + 1) + 1
+        ws.merged_cells.add(f'{get_column_letter(start_col)}1:{get_column_letter(start_col + num_cols - 1)}1')
+        separator_letter = get_column_letter(start_col + num_cols)
+        ws.merged_cells.add(f'{separator_letter}1:{separator_letter}{SEPARATOR_ROWS}')
+        ws.column_dimensions[get_column_letter(start_col)].width = STREAM_DATE_WIDTH
+        for column in range(start_col + 1, start_col + num_cols):
+            ws.column_dimensions[get_column_letter(column)].width = STREAM_NUMBER_WIDTH
+        ws.column_dimensions[separator_letter].width = 1
+
+        title_row += [styled_cell(ws, title, 'ba_title')] + [None] * (num_cols - 1)
+        title_row.append(styled_cell(ws, None, 'ba_separator'))
+        header_row += [styled_cell(ws, header, 'ba_header') for header in BATTING_COLUMNS]
+        header_row.append(styled_cell(ws, None, 'ba_separator'))
+    ws.append(title_row)
+    ws.append(header_row)
+
+    # The separators run down into the first data rows, as in add_batting_sheet
+    separator_data_rows = SEPARATOR_ROWS - 2
+    for position in range(max(len(row_sets[0]), separator_data_rows)):
+        separator_style = 'ba_separator' if position < separator_data_rows else None
+        row = []
+        for rows, average in zip(row_sets, averages):
+            if position >= len(rows):
+                row += [None] * num_cols + [styled_cell(ws, None, separator_style)]
+                continue
+            index = rows[position]
+            row += [data_cell(ws, column[index], 'ba_data', 'ba_date_data') for column in columns]
+            row.append(styled_cell(ws, int(check[index]), 'ba_data'))
+            row.append(styled_cell(ws, average if position == 0 else '', 'ba_data'))
+            row.append(styled_cell(ws, None, separator_style))
+        ws.append(row)
+
+
+@timed()
+def stream_excess_sheet(ws, fund_data_df, title):
+    fund_returns = fund_data_df['Fund Return'].to_numpy(dtype=np.float64)
+    benchmark_returns = fund_data_df['Benchmark Return'].to_numpy(dtype=np.float64)
+    columns = [fund_data_df[name].to_numpy() if name in fund_data_df.columns else
+               fund_returns - benchmark_returns for name in EXCESS_COLUMNS]
+
+    ws.column_dimensions['A'].width = STREAM_DATE_WIDTH
+    for column in range(2, len(EXCESS_COLUMNS) + 1):
+        ws.column_dimensions[get_column_letter(column)].width = STREAM_NUMBER_WIDTH
+    stream_title_row(ws, title, len(EXCESS_COLUMNS))
+    ws.append([styled_cell(ws, header, 'ba_bold_header') for header in EXCESS_COLUMNS])
+    for index in range(len(fund_data_df)):
+        ws.append([data_cell(ws, column[index], None, 'ba_plain_date') for column in columns])
+
+
+@timed()
+def stream_table_sheet(ws, df, title):
+    ws.column_dimensions['A'].width = STREAM_DATE_WIDTH
+    for column in range(2, df.shape[1] + 1):
+        ws.column_dimensions[get_column_letter(column)].width = STREAM_NUMBER_WIDTH
+    stream_title_row(ws, title, df.shape[1])
+    ws.append([styled_cell(ws, str(header), 'ba_bold_header') for header in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        ws.append([data_cell(ws, value, None, 'ba_plain_date') for value in row])
@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Export workbooks are built on a small shared pool and kept in memory until downloaded or expired, never on disk
+EXPORT_MAX_WORKERS = 2
+EXPORT_STORE_MAX_BYTES = 256 * 1024 * 1024
+EXPORT_TTL_SECONDS = 15 * 60
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    def __init__(self, file_name):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.status = QUEUED
+        self.error = None
+        self.size = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+# Finished workbook bytes by job id. Bounded by total size, oldest first, and entries expire after ttl_seconds.
+class ExportStore:
+    def __init__(self, max_bytes=EXPORT_STORE_MAX_BYTES, ttl_seconds=EXPORT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, job_id, content):
+        with self._lock:
+            self._remove(job_id)
+            self._entries[job_id] = (time.monotonic(), content)
+            self._total_bytes += len(content)
+            self._evict()
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(job_id)
+            return None if entry is None else entry[1]
+
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, job_id):
+        entry = self._entries.pop(job_id, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, (stored_at, _) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for job_id in expired:
+            self._remove(job_id)
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+export_results = ExportStore()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_MAX_WORKERS, thread_name_prefix='export')
+        return _executor
+
+
+# Queue build() on the export pool. build returns the workbook as bytes or a BytesIO. Returns the ExportJob at once.
+def submit_export(file_name, build):
+    job = ExportJob(file_name)
+    with _jobs_lock:
+        _forget_stale_jobs()
+        _jobs[job.id] = job
+
+    def run():
+        job.status = RUNNING
+        try:
+            content = build()
+            content = content.getvalue() if hasattr(content, 'getvalue') else bytes(content)
+            export_results.put(job.id, content)
+            job.size = len(content)
+            job.status = DONE
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    _get_executor().submit(run)
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+# The finished workbook's bytes, or None while it is still building, if it failed, or once it has been evicted
+def job_result(job_id):
+    return export_results.get(job_id)
+
+
+def _forget_stale_jobs():
+    # Job records outlive their bytes by one TTL at most
+    cutoff = time.time() - 2 * EXPORT_TTL_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished and job.finished_at < cutoff]:
+        del _jobs[job_id]
@@ -0,0 +1,170 @@
+import importlib.util
+import io
+import os
+import pandas as pd
+
+FUND_INFO_COLUMNS = ["Fund Name", "Benchmark Name", "Benchmark Ticker"]
+DATA_COLUMNS = ["Date", "Fund Return", "Benchmark Return"]
+# Any number of extra benchmarks can follow the template columns on the Data sheet, one "Benchmark Return <name>"
+# column each, e.g. "Benchmark Return Russell 1000 Value". "Benchmark Return" itself stays the primary benchmark.
+EXTRA_BENCHMARK_PREFIX = "Benchmark Return "
+# Price levels (a daily NAV export, say) can stand in for any return column: "Fund Price", "Benchmark Price" and
+# "Benchmark Price <name>". resampling.ingest_returns turns them into returns.
+PRICE_COLUMNS = {"Fund Return": "Fund Price", "Benchmark Return": "Benchmark Price"}
+EXTRA_BENCHMARK_PRICE_PREFIX = "Benchmark Price "
+DATA_DTYPES = {column: "float64" for column in ["Fund Return", "Benchmark Return", *PRICE_COLUMNS.values()]}
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv', '.parquet')
+
+# Optional faster engines. find_spec checks they are installed without paying for the import up front.
+# calamine is a Rust-based reader several times faster than openpyxl.
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') is not None else 'openpyxl'
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
+FAILED_CHECK = (None, None, None, None)
+
+
+# Work out whether an upload is xlsx, csv or parquet, from its name when it has one and its first bytes otherwise
+def detect_format(file):
+    name = getattr(file, 'name', file if isinstance(file, str) else '')
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension in SUPPORTED_EXTENSIONS:
+        return extension[1:]
+
+    if isinstance(file, str):
+        with open(file, 'rb') as handle:
+            magic = handle.read(4)
+    else:
+        position = file.tell()
+        magic = file.read(4)
+        file.seek(position)
+    if magic.startswith(b'PK'):
+        return 'xlsx'
+    if magic == b'PAR1':
+        return 'parquet'
+    return 'csv'
+
+
+def _prefixed_columns(columns, prefix):
+    return [column for column in columns if isinstance(column, str) and column.startswith(prefix)
+            and column[len(prefix):].strip()]
+
+
+# The extra benchmark columns among `columns`, in their original order
+def extra_benchmark_columns(columns):
+    return _prefixed_columns(columns, EXTRA_BENCHMARK_PREFIX)
+
+
+# The "Benchmark Price <name>" columns among `columns`, in their original order
+def extra_benchmark_price_columns(columns):
+    return _prefixed_columns(columns, EXTRA_BENCHMARK_PRICE_PREFIX)
+
+
+def _is_data_column(column):
+    return column in DATA_COLUMNS or column in PRICE_COLUMNS.values() or \
+        bool(extra_benchmark_columns([column]) or extra_benchmark_price_columns([column]))
+
+
+# The Fund and Benchmark columns an upload provides, each as returns when present and price levels otherwise.
+# None when either is missing.
+def _value_columns(columns):
+    value_columns = []
+    for return_column, price_column in PRICE_COLUMNS.items():
+        if return_column in columns:
+            value_columns.append(return_column)
+        elif price_column in columns:
+            value_columns.append(price_column)
+        else:
+            return None
+    return value_columns
+
+
+def _has_data_columns(columns):
+    return "Date" in columns and _value_columns(columns) is not None
+
+
+def _data_frame(table):
+    # Template columns first, then the extra benchmarks, every value column as float64 (blank cells become NaN).
+    # Dates typed as text in any format are parsed here; a date that cannot be parsed raises ValueError.
+    value_columns = _value_columns(table.columns) + extra_benchmark_columns(table.columns) + \
+        extra_benchmark_price_columns(table.columns)
+    fund_data = table[["Date"] + value_columns].astype({column: "float64" for column in value_columns})
+    fund_data["Date"] = pd.to_datetime(fund_data["Date"], errors='raise')
+    return fund_data
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return file
+
+
+# Read a Batting Average upload and validate it like uploaded_file_check always has. Returns
+# (pass_status, source, fund_info, fund_data), or four Nones when the upload does not match the template.
+def read_upload(file):
+    file_format = detect_format(file)
+    try:
+        if file_format == 'xlsx':
+            return _read_template_workbook(_rewind(file))
+        return _read_flat_upload(_rewind(file), file_format)
+    except (ValueError, KeyError):
+        # Missing columns, non-numeric returns or unreadable dates
+        return FAILED_CHECK
+
+
+def _read_template_workbook(file):
+    # Open the workbook once, both sheets are parsed from the same handle
+    workbook = pd.ExcelFile(file, engine=EXCEL_ENGINE)
+    if 'Fund Info' not in workbook.sheet_names or 'Data' not in workbook.sheet_names:
+        return FAILED_CHECK
+
+    fund_info = workbook.parse("Fund Info", usecols=lambda column: column in FUND_INFO_COLUMNS)
+    if any(column not in fund_info.columns for column in FUND_INFO_COLUMNS):
+        return FAILED_CHECK
+
+    fund_data = workbook.parse("Data", usecols=_is_data_column, dtype=DATA_DTYPES)
+    if not _has_data_columns(fund_data.columns):
+        return FAILED_CHECK
+
+    return "pass", workbook, fund_info[FUND_INFO_COLUMNS], _data_frame(fund_data)
+
+
+def _read_flat_upload(file, file_format):
+    # CSV and Parquet uploads are one table: the Data columns plus the Fund Info columns, whose first row is used
+    # The header is read first so only the template, price and extra benchmark columns are parsed
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        header = pq.ParquetFile(file).schema_arrow.names
+    else:
+        header = list(pd.read_csv(file, nrows=0).columns)
+    if not _has_data_columns(header):
+        raise ValueError("The upload is missing its Date, Fund or Benchmark column")
+    columns = [column for column in header if _is_data_column(column) or column in FUND_INFO_COLUMNS]
+
+    if file_format == 'parquet':
+        table = pd.read_parquet(_rewind(file), columns=columns)
+    else:
+        table = pd.read_csv(_rewind(file), usecols=columns, dtype=DATA_DTYPES, engine=CSV_ENGINE)
+
+    fund_info = table[FUND_INFO_COLUMNS].head(1).reset_index(drop=True)
+    fund_data = _data_frame(table).reset_index(drop=True)
+    return "pass", table, fund_info, fund_data
+
+
+# Read a single table (first sheet of a workbook, a CSV or a Parquet file) keeping only the given columns.
+# Raises ValueError naming the first missing column.
+def read_table(file, columns):
+    file_format = detect_format(file)
+    _rewind(file)
+    if file_format == 'xlsx':
+        table = pd.read_excel(file, usecols=lambda column: column in columns, engine=EXCEL_ENGINE)
+    elif file_format == 'parquet':
+        table = pd.read_parquet(file)
+    else:
+        table = pd.read_csv(io.BytesIO(file.read()) if hasattr(file, 'read') else file, engine=CSV_ENGINE)
+
+    for column in columns:
+        if column not in table.columns:
+            raise ValueError(f"The uploaded file must contain a '{column}' column")
+    return table[list(columns)]
@@ -0,0 +1,120 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Timing spans are off unless BATTING_PERF is set to something other than 0. When off, span() hands back one shared
+# do-nothing object and timed() returns the function untouched, so instrumented code pays almost nothing.
+PERF_ENV_VAR = 'BATTING_PERF'
+PERF_LOG_ENV_VAR = 'BATTING_PERF_LOG'
+DEFAULT_PERF_LOG = 'perf_spans.jsonl'
+RECENT_SPAN_LIMIT = 1000
+
+ENABLED = os.environ.get(PERF_ENV_VAR, '') not in ('', '0')
+LOG_PATH = os.environ.get(PERF_LOG_ENV_VAR, DEFAULT_PERF_LOG)
+
+_recent_spans = deque(maxlen=RECENT_SPAN_LIMIT)
+_log_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name, counters):
+        self.name = name
+        self.counters = counters
+        self.start = None
+
+    # Add to a counter such as rows processed or bytes read
+    def add(self, counter, amount):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        record = {
+            'name': self.name,
+            'timestamp': time.time(),
+            'duration_ms': round(duration * 1000, 3),
+            'counters': self.counters,
+            'error': exc_type.__name__ if exc_type is not None else None,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+        }
+        _record(record)
+        return False
+
+
+class _NullSpan:
+    def add(self, counter, amount):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# Time a block: `with span('file_parse', bytes=len(content)) as s: ...; s.add('rows', len(df))`
+def span(name, **counters):
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, counters)
+
+
+# Decorator form of span, named after the function unless a name is given
+def timed(name=None):
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(record):
+    _recent_spans.append(record)
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        try:
+            with open(LOG_PATH, 'a') as log:
+                log.write(line + '\n')
+        except OSError:
+            # Losing a log line must never break the page being timed
+            pass
+
+
+# The most recent spans, oldest first
+def recent_spans():
+    return list(_recent_spans)
+
+
+# Per-stage totals over the recent spans: calls, total/mean/max milliseconds and summed counters
+def span_summary():
+    summary = {}
+    for record in _recent_spans:
+        stage = summary.setdefault(record['name'], {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stage['calls'] += 1
+        stage['total_ms'] += record['duration_ms']
+        stage['max_ms'] = max(stage['max_ms'], record['duration_ms'])
+        for counter, amount in record['counters'].items():
+            stage[counter] = stage.get(counter, 0) + amount
+    for stage in summary.values():
+        stage['mean_ms'] = stage['total_ms'] / stage['calls']
+    return summary
+
+
+def clear_spans():
+    _recent_spans.clear()
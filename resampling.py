@@ -0,0 +1,150 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from data_functions import calculate_tracking_error
+from file_readers import PRICE_COLUMNS, EXTRA_BENCHMARK_PREFIX, EXTRA_BENCHMARK_PRICE_PREFIX, \
+    extra_benchmark_price_columns
+
+# Frequencies uploads can come in or be compounded to, and their annualization factors. Daily means trading days.
+PERIODS_PER_YEAR = {'D': 252, 'W': 52, 'M': 12, 'Q': 4, 'Y': 1}
+FREQUENCY_NAMES = {'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly', 'Q': 'Quarterly', 'Y': 'Annual'}
+# Largest median gap in calendar days between observations for each frequency, finest first
+FREQUENCY_MAX_GAP_DAYS = [('D', 4), ('W', 10), ('M', 45), ('Q', 140), ('Y', None)]
+# The scoring pipeline, the database and the rolling windows all work on monthly returns
+DEFAULT_FREQUENCY = 'M'
+
+RETURN_COLUMNS_BY_PRICE = {price_column: return_column for return_column, price_column in PRICE_COLUMNS.items()}
+
+# data: returns at the requested frequency, or at the upload's own frequency when that is coarser, with the usual
+# Date / Fund Return / Benchmark Return columns. periods_per_year is data's annualization factor.
+# high_frequency: the returns at the upload's own, finer frequency, or None when the upload was not finer.
+IngestedReturns = namedtuple('IngestedReturns', ['data', 'periods_per_year', 'high_frequency',
+                                                 'high_frequency_periods_per_year'])
+
+
+def _day_numbers(dates):
+    return np.asarray(dates, dtype='datetime64[D]')
+
+
+# 'D', 'W', 'M', 'Q' or 'Y' from the median gap between consecutive dates. Fewer than two dates count as monthly.
+def infer_frequency(dates):
+    days = _day_numbers(dates)
+    if len(days) < 2:
+        return DEFAULT_FREQUENCY
+    gap = np.median(np.diff(days).astype(np.int64))
+    for frequency, max_gap in FREQUENCY_MAX_GAP_DAYS:
+        if max_gap is None or gap <= max_gap:
+            return frequency
+
+
+def infer_periods_per_year(dates):
+    return PERIODS_PER_YEAR[infer_frequency(dates)]
+
+
+# Simple returns from price levels along the last axis. The first period has no return and comes back as NaN.
+def prices_to_returns(prices):
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(prices.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[..., 1:] = prices[..., 1:] / prices[..., :-1] - 1
+    return returns
+
+
+# Calendar end of the period each date falls in. Weeks end on Friday.
+def period_end_dates(dates, frequency):
+    days = _day_numbers(dates)
+    if frequency == 'D':
+        return days
+    if frequency == 'W':
+        # 1970-01-01 was a Thursday, so (day number + 3) % 7 is the weekday with Monday as 0
+        weekdays = (days.astype(np.int64) + 3) % 7
+        return days + ((4 - weekdays) % 7).astype('timedelta64[D]')
+    months = days.astype('datetime64[M]')
+    if frequency == 'Q':
+        month_numbers = months.astype(np.int64)
+        months = (month_numbers - month_numbers % 3 + 2).astype('datetime64[M]')
+    elif frequency == 'Y':
+        months = days.astype('datetime64[Y]').astype('datetime64[M]') + np.timedelta64(11, 'M')
+    elif frequency != 'M':
+        raise ValueError(f"Unknown frequency {frequency}")
+    return (months + np.timedelta64(1, 'M')).astype('datetime64[D]') - np.timedelta64(1, 'D')
+
+
+# Compound returns (1-D, or a series x periods matrix such as hundreds of funds' daily histories) into the periods
+# of `frequency`. dates must be sorted. Every series is reduced in the same np.add.reduceat over log growth, so the
+# cost is one pass over the matrix. NaN periods are skipped; a bucket with no returns at all comes back NaN.
+# Returns (period end dates, compounded returns).
+def compound_returns(dates, returns, frequency=DEFAULT_FREQUENCY):
+    ends = period_end_dates(dates, frequency)
+    values = np.asarray(returns, dtype=np.float64)
+    if len(ends) == 0:
+        return ends, values
+    starts = np.flatnonzero(np.concatenate(([True], ends[1:] != ends[:-1])))
+
+    valid = ~np.isnan(values)
+    log_growth = np.log1p(np.where(valid, values, 0.0))
+    growth = np.add.reduceat(log_growth, starts, axis=-1)
+    counts = np.add.reduceat(valid, starts, axis=-1)
+    return ends[starts], np.where(counts > 0, np.expm1(growth), np.nan)
+
+
+def _return_column(price_column):
+    if price_column in RETURN_COLUMNS_BY_PRICE:
+        return RETURN_COLUMNS_BY_PRICE[price_column]
+    return EXTRA_BENCHMARK_PREFIX + price_column[len(EXTRA_BENCHMARK_PRICE_PREFIX):]
+
+
+# Replace price level columns with the matching return columns. A price column's first row has no return and is left
+# NaN; the first row is only dropped when the Fund or Benchmark column itself came from prices.
+def _returns_frame(fund_data_df):
+    price_columns = [column for column in fund_data_df.columns
+                     if column in RETURN_COLUMNS_BY_PRICE or column in extra_benchmark_price_columns([column])]
+    if not price_columns:
+        return fund_data_df
+    returns = prices_to_returns(fund_data_df[price_columns].to_numpy(dtype=np.float64).T)
+    fund_data_df = fund_data_df.assign(**{column: values for column, values in zip(price_columns, returns)})
+    fund_data_df = fund_data_df.rename(columns={column: _return_column(column) for column in price_columns})
+    if not any(column in RETURN_COLUMNS_BY_PRICE for column in price_columns):
+        return fund_data_df
+    return fund_data_df.iloc[1:].reset_index(drop=True)
+
+
+# Compound every return column of a Data frame to `frequency`, all columns in one reduction
+def resample_returns(fund_data_df, frequency=DEFAULT_FREQUENCY):
+    value_columns = [column for column in fund_data_df.columns if column != 'Date']
+    ends, compounded = compound_returns(fund_data_df['Date'].to_numpy(),
+                                        fund_data_df[value_columns].to_numpy(dtype=np.float64).T, frequency)
+    resampled = pd.DataFrame(dict(zip(value_columns, compounded)))
+    resampled.insert(0, 'Date', pd.to_datetime(ends))
+    return resampled
+
+
+# The ingestion stage every upload goes through before scoring: price levels become returns, the upload's frequency
+# is inferred, and anything finer than `frequency` is compounded up to it. Monthly return uploads pass straight through.
+def ingest_returns(fund_data_df, frequency=DEFAULT_FREQUENCY):
+    dates = fund_data_df['Date'].to_numpy()
+    if len(dates) > 1 and (np.diff(dates) < np.timedelta64(0)).any():
+        fund_data_df = fund_data_df.sort_values('Date', kind='stable').reset_index(drop=True)
+    # Prices are differenced in date order
+    fund_data_df = _returns_frame(fund_data_df)
+    dates = fund_data_df['Date'].to_numpy()
+
+    native_frequency = infer_frequency(dates)
+    if PERIODS_PER_YEAR[native_frequency] <= PERIODS_PER_YEAR[frequency]:
+        return IngestedReturns(fund_data_df, PERIODS_PER_YEAR[native_frequency], None, None)
+    return IngestedReturns(resample_returns(fund_data_df, frequency), PERIODS_PER_YEAR[frequency], fund_data_df,
+                           PERIODS_PER_YEAR[native_frequency])
+
+
+def frequency_name(periods_per_year):
+    return next(FREQUENCY_NAMES[frequency] for frequency, periods in PERIODS_PER_YEAR.items()
+                if periods == periods_per_year)
+
+
+# Tracking error of the kept high-frequency series (daily tracking error for a daily upload), annualized with that
+# series' own factor. None when the upload was not finer than the scored data.
+def high_frequency_tracking_error(ingested):
+    if ingested.high_frequency is None:
+        return None
+    excess = (ingested.high_frequency['Fund Return'] - ingested.high_frequency['Benchmark Return']).dropna()
+    return float(calculate_tracking_error(excess, ingested.high_frequency_periods_per_year))
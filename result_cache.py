@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Process-wide defaults for the upload result cache
+UPLOAD_CACHE_MAX_ENTRIES = 16
+UPLOAD_CACHE_TTL_SECONDS = 30 * 60
+
+
+# SHA-256 of an upload's bytes. Accepts bytes or any file-like object (Streamlit's UploadedFile included).
+def content_hash(file):
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(file).hexdigest()
+    if hasattr(file, 'getvalue'):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1 << 20), b''):
+        digest.update(chunk)
+    file.seek(position)
+    return digest.hexdigest()
+
+
+# Bounded LRU cache with a time-to-live. Safe to share between Streamlit sessions, which run on different threads.
+class ResultCache:
+    def __init__(self, max_entries=UPLOAD_CACHE_MAX_ENTRIES, ttl_seconds=UPLOAD_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        # compute runs outside the lock, two sessions racing on the same new key just compute it twice
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (stored_at, _) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_MISSING = object()
+
+# Parsed frames and computed metrics for Test Fund uploads, keyed by content_hash
+upload_results = ResultCache()
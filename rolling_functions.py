@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = (12, 36, 60)
+
+
+# Sum of every length-`window` slice in one pass, from a cumulative sum
+def _window_sums(values, window):
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return cumulative[window:] - cumulative[:-window]
+
+
+def rolling_batting_metrics(fund_data_df, window, periods_per_year=12):
+    # All windows come out of cumulative sums, so this is O(n) whatever the window length.
+    # Each row describes the window ending on that row's date. As in batch_batting_metrics, a month missing either
+    # return is left out: it counts as zero in the running sums and not at all in the window's month count.
+    fund_returns = fund_data_df['Fund Return'].to_numpy(dtype=np.float64)
+    benchmark_returns = fund_data_df['Benchmark Return'].to_numpy(dtype=np.float64)
+    if window > len(fund_returns):
+        return pd.DataFrame()
+
+    valid = ~(np.isnan(fund_returns) | np.isnan(benchmark_returns))
+    fund_returns = np.where(valid, fund_returns, 0.0)
+    benchmark_returns = np.where(valid, benchmark_returns, 0.0)
+    check = valid & (fund_returns > benchmark_returns)
+    up = valid & (benchmark_returns > 0)
+    down = valid & (benchmark_returns < 0)
+
+    months = _window_sums(valid, window)
+    wins = _window_sums(check, window)
+    up_months = _window_sums(up, window)
+    down_months = _window_sums(down, window)
+    up_wins = _window_sums(check & up, window)
+    down_wins = _window_sums(check & down, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Running sums of squares for the tracking error, centred first so the subtraction stays accurate
+        excess = fund_returns - benchmark_returns
+        centred_excess = np.where(valid, excess - (excess.sum() / valid.sum() if valid.any() else 0.0), 0.0)
+        excess_sums = _window_sums(centred_excess, window)
+        excess_squares = _window_sums(centred_excess * centred_excess, window)
+        excess_variance = np.maximum(excess_squares / months - (excess_sums / months) ** 2, 0.0)
+        tracking_error = np.sqrt(excess_variance) * np.sqrt(periods_per_year)
+
+        # Compounded growth over the window from running sums of log returns
+        fund_growth = _window_sums(np.log1p(fund_returns), window)
+        benchmark_growth = _window_sums(np.log1p(benchmark_returns), window)
+        annualized_excess = np.expm1(fund_growth * periods_per_year / months) - \
+            np.expm1(benchmark_growth * periods_per_year / months)
+
+        rolling = pd.DataFrame({
+            'All Time Average': np.where(months > 0, wins / months, np.nan),
+            # Windows without any up (or down) benchmark months have no average rather than 0
+            'Up Benchmark': np.where(up_months > 0, up_wins / up_months, np.nan),
+            'Down Benchmark': np.where(down_months > 0, down_wins / down_months, np.nan),
+            'Tracking Error': np.where(months > 0, tracking_error, np.nan),
+            'Information Ratio': np.where(tracking_error > 0, annualized_excess / tracking_error, np.nan),
+        })
+    rolling.insert(0, 'Date', fund_data_df['Date'].to_numpy()[window - 1:])
+    return rolling
+
+
+def rolling_batting_table(fund_data_df, windows=ROLLING_WINDOWS, periods_per_year=12):
+    # One wide table with every window side by side, e.g. "All Time Average 12M", for charts and the export sheet.
+    # Windows are lined up by row position rather than by date, so an upload that repeats a date still joins 1:1.
+    tables = []
+    for window in windows:
+        rolling = rolling_batting_metrics(fund_data_df, window, periods_per_year)
+        if rolling.empty:
+            continue
+        rolling.index = np.arange(window - 1, len(fund_data_df))
+        tables.append(rolling.drop(columns='Date').add_suffix(f' {window}M'))
+    if not tables:
+        return pd.DataFrame()
+    table = pd.concat(tables, axis=1).sort_index()
+    table.insert(0, 'Date', fund_data_df['Date'].to_numpy()[table.index])
+    return table.reset_index(drop=True)
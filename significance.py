@@ -0,0 +1,119 @@
+import os
+import threading
+import numpy as np
+
+# Null hypothesis: every month the fund beats its benchmark with a coin flip, independently of the others. The null
+# distribution of win counts only depends on (months, up months, down months), so it is simulated once per split and
+# kept on disk as small .npz files. A universe refresh then costs one file read per split, or nothing when the split
+# has been seen by this process before.
+NULL_CACHE_DIR = 'null_cache'
+NULL_SIMULATIONS = 200000
+NULL_WIN_PROBABILITY = 0.5
+NULL_SEED = 0
+NULL_MEMORY_ENTRIES = 4096
+
+_memory_cache = {}
+_memory_lock = threading.Lock()
+
+
+def _null_path(months, up_months, down_months, simulations):
+    return os.path.join(NULL_CACHE_DIR, f'null_{months}_{up_months}_{down_months}_{simulations}.npz')
+
+
+# Number of simulations with at least k wins, for every k from 0 to len(wins)
+def _at_least_counts(wins, periods):
+    counts = np.bincount(wins, minlength=periods + 1)
+    return counts[::-1].cumsum()[::-1]
+
+
+# Simulate the null distribution of the all, up and down win counts for one split, all simulations at once. Flat
+# benchmark months only count towards the all-time average. Seeded by the split, so the result does not depend on
+# which funds were scored first.
+def simulate_null_distribution(months, up_months, down_months, simulations=NULL_SIMULATIONS):
+    rng = np.random.default_rng([NULL_SEED, months, up_months, down_months])
+    flat_months = months - up_months - down_months
+    up_wins = rng.binomial(up_months, NULL_WIN_PROBABILITY, simulations)
+    down_wins = rng.binomial(down_months, NULL_WIN_PROBABILITY, simulations)
+    general_wins = up_wins + down_wins + rng.binomial(flat_months, NULL_WIN_PROBABILITY, simulations)
+    return {
+        'general': _at_least_counts(general_wins, months),
+        'up': _at_least_counts(up_wins, up_months),
+        'down': _at_least_counts(down_wins, down_months),
+    }
+
+
+def _load_null_distribution(path):
+    try:
+        with np.load(path) as cached:
+            return {name: cached[name] for name in ('general', 'up', 'down')}
+    except (OSError, KeyError, ValueError):
+        # Missing, or half-written by a process that died mid-save
+        return None
+
+
+def _store_null_distribution(path, distribution):
+    os.makedirs(NULL_CACHE_DIR, exist_ok=True)
+    partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+    with open(partial_path, 'wb') as f:
+        np.savez(f, **distribution)
+    os.replace(partial_path, path)
+
+
+# The null distribution for a split, from memory, then disk, then a fresh simulation that is saved for next time
+def null_distribution(months, up_months, down_months, simulations=NULL_SIMULATIONS):
+    key = (int(months), int(up_months), int(down_months), simulations)
+    with _memory_lock:
+        distribution = _memory_cache.get(key)
+    if distribution is not None:
+        return distribution
+
+    path = _null_path(*key)
+    distribution = _load_null_distribution(path)
+    if distribution is None:
+        distribution = simulate_null_distribution(*key)
+        try:
+            _store_null_distribution(path, distribution)
+        except OSError:
+            # A read-only working directory only costs the next process a simulation
+            pass
+
+    with _memory_lock:
+        if len(_memory_cache) >= NULL_MEMORY_ENTRIES:
+            _memory_cache.pop(next(iter(_memory_cache)))
+        _memory_cache[key] = distribution
+    return distribution
+
+
+def _p_value(at_least_counts, wins, periods, simulations):
+    if periods == 0:
+        return float('nan')
+    # The observed history counts as one more draw, so a p-value is never exactly zero
+    return float((at_least_counts[int(wins)] + 1) / (simulations + 1))
+
+
+# One-sided p-values for the all, up and down batting averages: the chance of at least this many wins by luck alone
+def batting_p_values(months, up_months, down_months, wins, up_wins, down_wins, simulations=NULL_SIMULATIONS):
+    months, up_months, down_months = int(months), int(up_months), int(down_months)
+    distribution = null_distribution(months, up_months, down_months, simulations)
+    return (_p_value(distribution['general'], wins, months, simulations),
+            _p_value(distribution['up'], up_wins, up_months, simulations),
+            _p_value(distribution['down'], down_wins, down_months, simulations))
+
+
+# batting_p_values for the FundMetrics data_functions.fund_metrics returns
+def fund_p_values(metrics, simulations=NULL_SIMULATIONS):
+    return batting_p_values(metrics.months, np.count_nonzero(metrics.up), np.count_nonzero(metrics.down),
+                            np.count_nonzero(metrics.wins), np.count_nonzero(metrics.wins & metrics.up),
+                            np.count_nonzero(metrics.wins & metrics.down), simulations)
+
+
+def clear_null_cache():
+    with _memory_lock:
+        _memory_cache.clear()
+    if not os.path.isdir(NULL_CACHE_DIR):
+        return
+    for entry in os.scandir(NULL_CACHE_DIR):
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
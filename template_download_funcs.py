@@ -1,17 +1,30 @@
-import pandas as pd
-from io import BytesIO
+import os
+import threading
 
 # Path to the existing Excel file
 test_fund_file_path = 'Batting_Average_Template.xlsx'
 bell_file_path = 'Fund_import_template.xlsx'
 
+# Template bytes by path, with the mtime they were read at. A stat per rerun replaces a full read.
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+# Return a template file's content from memory, re-reading it only when the file has changed on disk
+def read_template(path):
+    mtime = os.stat(path).st_mtime_ns
+    cached = _template_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _template_lock:
+        with open(path, 'rb') as file:
+            file_content = file.read()
+        _template_cache[path] = (mtime, file_content)
+    return file_content
+
 # Function to read the Excel file and return its content
 def get_test_file_content():
-    with open(test_fund_file_path, 'rb') as file:
-        file_content = file.read()
-    return file_content
+    return read_template(test_fund_file_path)
 
 def get_bell_file_content():
-    with open(bell_file_path, 'rb') as file:
-        file_content = file.read()
-    return file_content
+    return read_template(bell_file_path)
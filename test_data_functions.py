@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from data_functions import all_around_batting_average, up_benchmark_batting_average, \
+    down_benchmark_batting_average, calculate_excess_return, calculate_annualized_return, \
+    calculate_annualized_std, calculate_tracking_error, calculate_sharpe_ratio, calculate_information_ratio, \
+    batch_batting_metrics, fund_metrics
+
+
+def _returns_with_gaps(months=120, seed=7):
+    rng = np.random.default_rng(seed)
+    fund = rng.normal(0.008, 0.045, months)
+    benchmark = rng.normal(0.006, 0.04, months)
+    fund[[3, 40, 41]] = np.nan
+    benchmark[[40, 77, 118]] = np.nan
+    return fund, benchmark
+
+
+# The baseline pandas path, run on the months that have both returns
+def _baseline_metrics(fund, benchmark, periods_per_year):
+    complete = ~(np.isnan(fund) | np.isnan(benchmark))
+    fund_data_df = pd.DataFrame({"Fund Return": fund[complete], "Benchmark Return": benchmark[complete]})
+    general_table, general_average = all_around_batting_average(fund_data_df)
+    _, up_average = up_benchmark_batting_average(general_table)
+    _, down_average = down_benchmark_batting_average(general_table)
+    fund_data_df = calculate_excess_return(fund_data_df)
+
+    annualized_return_fund = calculate_annualized_return(fund_data_df['Fund Return'], periods_per_year)
+    annualized_return_benchmark = calculate_annualized_return(fund_data_df['Benchmark Return'], periods_per_year)
+    annualized_std_fund = calculate_annualized_std(fund_data_df['Fund Return'], periods_per_year)
+    annualized_std_benchmark = calculate_annualized_std(fund_data_df['Benchmark Return'], periods_per_year)
+    tracking_error = calculate_tracking_error(fund_data_df['Excess Return'], periods_per_year)
+    excess_return = annualized_return_fund - annualized_return_benchmark
+    return {
+        'months': len(fund_data_df),
+        'general_average': general_average,
+        'up_average': up_average,
+        'down_average': down_average,
+        'annualized_return_fund': annualized_return_fund,
+        'annualized_return_benchmark': annualized_return_benchmark,
+        'annualized_std_fund': annualized_std_fund,
+        'annualized_std_benchmark': annualized_std_benchmark,
+        'excess_return': excess_return,
+        'tracking_error': tracking_error,
+        'sharpe_ratio_fund': calculate_sharpe_ratio(annualized_return_fund, annualized_std_fund),
+        'sharpe_ratio_benchmark': calculate_sharpe_ratio(annualized_return_benchmark, annualized_std_benchmark),
+        'information_ratio': calculate_information_ratio(excess_return, tracking_error),
+    }
+
+
+def test_fund_metrics_matches_baseline_with_missing_months():
+    fund, benchmark = _returns_with_gaps()
+    for periods_per_year in (12, 52):
+        metrics = fund_metrics(fund, benchmark, periods_per_year)
+        for name, expected in _baseline_metrics(fund, benchmark, periods_per_year).items():
+            assert np.isclose(getattr(metrics, name), expected), name
+
+
+def test_fund_metrics_matches_batch_batting_metrics_with_missing_months():
+    fund, benchmark = _returns_with_gaps()
+    metrics = fund_metrics(fund, benchmark)
+    batch = batch_batting_metrics(fund, benchmark)
+    for name in ('months', 'general_average', 'up_average', 'down_average', 'annualized_return_fund',
+                 'annualized_std_fund', 'tracking_error', 'sharpe_ratio_fund', 'information_ratio'):
+        assert np.isclose(getattr(metrics, name), batch[name][0]), name
+    assert np.count_nonzero(metrics.wins) == batch['wins'][0]
+    assert np.count_nonzero(metrics.up) == batch['up_months'][0]
+    assert np.count_nonzero(metrics.down) == batch['down_months'][0]
+
+
+def test_fund_metrics_masks_keep_one_entry_per_row():
+    fund, benchmark = _returns_with_gaps()
+    metrics = fund_metrics(fund, benchmark)
+    missing = np.isnan(fund) | np.isnan(benchmark)
+    for mask in (metrics.wins, metrics.up, metrics.down):
+        assert len(mask) == len(fund)
+        assert not mask[missing].any()
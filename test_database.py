@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'funds_scores.db'))
+    yield database.DB_PATH
+    database.close_connection()
+
+
+def _history(seed, months=36):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-31', periods=months, freq='ME')
+    return dates, rng.normal(0.01, 0.04, months), rng.normal(0.008, 0.04, months)
+
+
+def _peer_groups():
+    conn = database.connect_db()
+    return dict(conn.execute('SELECT fund_name, peer_group FROM fund_peer_ranks').fetchall())
+
+
+def test_benchmark_swap_in_one_bulk_sync_reranks_both_groups(db_path):
+    fund_a, fund_b = _history(1), _history(2)
+    database.sync_fund_returns_many([('Fund A', 'Idx1', 'I1', *fund_a), ('Fund B', 'Idx2', 'I2', *fund_b)])
+    assert _peer_groups() == {'Fund A': 'Idx1', 'Fund B': 'Idx2'}
+
+    database.sync_fund_returns_many([('Fund A', 'Idx2', 'I2', *fund_a), ('Fund B', 'Idx1', 'I1', *fund_b)])
+    assert _peer_groups() == {'Fund A': 'Idx2', 'Fund B': 'Idx1'}
+    conn = database.connect_db()
+    assert dict(conn.execute('SELECT fund_name, benchmark_name FROM fund_scores').fetchall()) == \
+        {'Fund A': 'Idx2', 'Fund B': 'Idx1'}
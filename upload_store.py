@@ -0,0 +1,154 @@
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from data_functions import batch_batting_metrics
+from resampling import ingest_returns
+
+# Parsed uploads are kept as uncompressed Arrow IPC files so they can be memory-mapped and read without copying
+UPLOAD_STORE_DIR = 'upload_cache'
+UPLOAD_STORE_MAX_BYTES = 256 * 1024 * 1024
+UPLOAD_FILE_SUFFIX = '.arrow'
+FUND_INFO_METADATA_KEY = b'fund_info'
+
+_store_lock = threading.Lock()
+
+
+def _upload_path(key):
+    return os.path.join(UPLOAD_STORE_DIR, key + UPLOAD_FILE_SUFFIX)
+
+
+# Save the parsed Fund Info and Data frames of an upload under its content hash. The Data sheet is the table,
+# Fund Info rides along in the schema metadata. The store is only a cache: an upload Arrow cannot represent, such as
+# a column of mixed text and numbers, or a failed write is skipped, and the upload is parsed again next time.
+def store_upload(key, fund_info, fund_data):
+    path = _upload_path(key)
+    if os.path.exists(path):
+        # Keys are content hashes, so an existing file already holds these frames
+        return
+    try:
+        table = pa.Table.from_pandas(fund_data, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[FUND_INFO_METADATA_KEY] = fund_info.to_json(orient='split', index=False,
+                                                             date_format='iso').encode()
+        table = table.replace_schema_metadata(metadata)
+    except (pa.ArrowException, TypeError, ValueError):
+        return
+
+    partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+    try:
+        os.makedirs(UPLOAD_STORE_DIR, exist_ok=True)
+        with pa.OSFile(partial_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(partial_path, path)
+    except (pa.ArrowException, OSError):
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return
+    _evict()
+
+
+def _read_table(path):
+    # The returned table's buffers point straight into the mapped file
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _fund_info_from_table(table):
+    return pd.read_json(io.StringIO(table.schema.metadata[FUND_INFO_METADATA_KEY].decode()), orient='split',
+                        dtype=False)
+
+
+# Load a cached upload as (fund_info, fund_data), or None when it is not in the store. The Data columns are
+# zero-copy views of the mapped file, so they are read-only.
+def load_upload(key):
+    path = _upload_path(key)
+    try:
+        table = _read_table(path)
+        # Touching the file keeps eviction least-recently-used
+        os.utime(path)
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    fund_data = table.to_pandas(split_blocks=True, self_destruct=False)
+    return _fund_info_from_table(table), fund_data
+
+
+# Every upload in the store as (fund_info, data table) pairs, least recently used first, for analytics across funds
+def scan_uploads():
+    for key, _, _ in sorted(_stored_files(), key=lambda item: item[1]):
+        try:
+            table = _read_table(_upload_path(key))
+        except (FileNotFoundError, pa.ArrowInvalid):
+            # Evicted or half-written by another session while we were scanning
+            continue
+        yield _fund_info_from_table(table), table
+
+
+# Batting averages for every cached upload, one row per fund, in the same shape as the fund_scores table
+def cached_upload_scores():
+    fund_rows, fund_series, benchmark_series = [], [], []
+    for fund_info, table in scan_uploads():
+        if fund_info.empty or table.num_rows == 0:
+            continue
+        fund_rows.append((fund_info['Fund Name'].iloc[0], fund_info['Benchmark Name'].iloc[0],
+                          fund_info['Benchmark Ticker'].iloc[0]))
+        # The store keeps uploads as they came in, daily prices included, so score their monthly returns
+        fund_data = ingest_returns(table.to_pandas(split_blocks=True)).data
+        fund_series.append(fund_data['Fund Return'].to_numpy())
+        benchmark_series.append(fund_data['Benchmark Return'].to_numpy())
+
+    df = pd.DataFrame(fund_rows, columns=["Fund", "Benchmark", "Ticker"])
+    # Histories differ in length, pad them with NaN (a missing period) and score every fund in one batch
+    periods = max((len(series) for series in fund_series), default=0)
+    fund_matrix = np.full((len(fund_series), periods), np.nan)
+    benchmark_matrix = np.full((len(fund_series), periods), np.nan)
+    for row, (fund_returns, benchmark_returns) in enumerate(zip(fund_series, benchmark_series)):
+        fund_matrix[row, :len(fund_returns)] = fund_returns
+        benchmark_matrix[row, :len(benchmark_returns)] = benchmark_returns
+    metrics = batch_batting_metrics(fund_matrix, benchmark_matrix)
+
+    df["All Time Average"] = metrics['general_average']
+    df["Up Benchmark"] = metrics['up_average']
+    df["Down Benchmark"] = metrics['down_average']
+    df["Final"] = (df["Up Benchmark"] + df["Down Benchmark"]) / 2
+    # A fund uploaded twice with different data shows up once, using its most recently used upload
+    return df.drop_duplicates(subset="Fund", keep="last").reset_index(drop=True)
+
+
+def clear_uploads():
+    with _store_lock:
+        for key, _, _ in _stored_files():
+            try:
+                os.remove(_upload_path(key))
+            except OSError:
+                continue
+
+
+def _stored_files():
+    if not os.path.isdir(UPLOAD_STORE_DIR):
+        return []
+    files = []
+    for entry in os.scandir(UPLOAD_STORE_DIR):
+        if entry.name.endswith(UPLOAD_FILE_SUFFIX):
+            stat = entry.stat()
+            files.append((entry.name[:-len(UPLOAD_FILE_SUFFIX)], stat.st_mtime, stat.st_size))
+    return files
+
+
+def _evict():
+    # Drop the least recently used uploads until the store fits in UPLOAD_STORE_MAX_BYTES
+    with _store_lock:
+        files = sorted(_stored_files(), key=lambda item: item[1])
+        total_bytes = sum(size for _, _, size in files)
+        for key, _, size in files:
+            if total_bytes <= UPLOAD_STORE_MAX_BYTES:
+                break
+            try:
+                os.remove(_upload_path(key))
+            except OSError:
+                # Already gone, or still mapped by a reader on a platform that will not unlink open files
+                continue
+            total_bytes -= size